@@ -3,11 +3,19 @@
 -- Информационная система управления логистикой и доставкой
 -- ===================================================================
 
+-- Запросы с пометкой "-- report: <имя>" доступны через API как отчёты
+-- (GET /api/reports/<имя>, см. reports.py) с параметрами периода и склада.
+--
+-- orders и deliveries разбиты на секции по месяцам (migrations/005_partitioning.sql):
+-- условие на order_date / created_at того же типа, что и колонка, позволяет
+-- читать только секции нужного периода.
+
 -- ===================================================================
 -- 1. СТАТИСТИКА ПО ЗАКАЗАМ
 -- ===================================================================
 
 -- Количество заказов по статусам
+-- report: orders_by_status
 SELECT 
     status,
     COUNT(*) as count,
@@ -17,6 +25,7 @@ GROUP BY status
 ORDER BY count DESC;
 
 -- Заказы по приоритетам с суммой стоимости
+-- report: orders_by_priority
 SELECT 
     priority,
     COUNT(*) as order_count,
@@ -27,16 +36,17 @@ GROUP BY priority
 ORDER BY total_cost DESC;
 
 -- Заказы за последние 30 дней
+-- report: recent_orders
 SELECT 
     order_number,
-    o.company_name,
+    c.company_name,
     order_date,
     delivery_date,
     status,
     cost
 FROM orders o
 JOIN customers c ON o.customer_id = c.customer_id
-WHERE order_date >= CURRENT_DATE - INTERVAL '30 days'
+WHERE order_date >= CURRENT_DATE - 30
 ORDER BY order_date DESC;
 
 -- ===================================================================
@@ -44,6 +54,7 @@ ORDER BY order_date DESC;
 -- ===================================================================
 
 -- Количество доставок по статусам с временем в пути
+-- report: shipments_by_status
 SELECT 
     status,
     COUNT(*) as delivery_count,
@@ -53,6 +64,7 @@ WHERE departure_time IS NOT NULL
 GROUP BY status;
 
 -- Средний расход топлива по типам транспорта
+-- report: fuel_by_vehicle_type
 SELECT 
     v.vehicle_type,
     COUNT(s.shipment_id) as shipments,
@@ -65,6 +77,7 @@ GROUP BY v.vehicle_type
 ORDER BY avg_fuel DESC;
 
 -- Скорость доставки (часов) по маршрутам
+-- report: route_speed
 SELECT 
     dr.route_name,
     COUNT(s.shipment_id) as deliveries,
@@ -81,6 +94,7 @@ ORDER BY avg_hours DESC;
 -- ===================================================================
 
 -- Доход по месяцам
+-- report: revenue_by_month
 SELECT 
     DATE_TRUNC('month', order_date)::DATE as month,
     COUNT(*) as order_count,
@@ -91,6 +105,7 @@ GROUP BY DATE_TRUNC('month', order_date)
 ORDER BY month DESC;
 
 -- Доход по клиентам (TOP 10)
+-- report: top_customers
 SELECT 
     c.company_name,
     COUNT(o.order_id) as order_count,
@@ -103,6 +118,7 @@ ORDER BY total_spent DESC
 LIMIT 10;
 
 -- Затраты на доставку по отношению к доходу
+-- report: shipping_cost_ratio
 SELECT 
     DATE_TRUNC('month', o.order_date)::DATE as month,
     SUM(o.cost) as revenue,
@@ -118,6 +134,7 @@ ORDER BY month DESC;
 -- ===================================================================
 
 -- Производительность водителей
+-- report: driver_ratings
 SELECT 
     e.full_name,
     d.rating,
@@ -137,6 +154,7 @@ GROUP BY d.driver_id, e.full_name, d.rating
 ORDER BY d.rating DESC;
 
 -- Количество завершенных доставок по водителям
+-- report: driver_completion
 SELECT 
     e.full_name,
     COUNT(CASE WHEN s.status = 'Delivered' THEN 1 END) as completed,
@@ -153,6 +171,7 @@ ORDER BY completed DESC;
 -- ===================================================================
 
 -- Загруженность транспорта
+-- report: vehicle_utilization
 SELECT 
     v.license_plate,
     v.vehicle_type,
@@ -171,6 +190,7 @@ GROUP BY v.vehicle_id, v.license_plate, v.vehicle_type, v.brand, v.model, v.mile
 ORDER BY shipments DESC;
 
 -- Требующие обслуживания транспортные средства
+-- report: vehicle_maintenance
 SELECT 
     license_plate,
     vehicle_type,
@@ -190,6 +210,7 @@ ORDER BY last_maintenance ASC NULLS FIRST;
 -- ===================================================================
 
 -- Заполненность складов
+-- report: warehouse_occupancy
 SELECT 
     warehouse_name,
     city,
@@ -205,6 +226,7 @@ FROM warehouses
 ORDER BY occupancy_percent DESC;
 
 -- Эффективность складов (заказов через каждый)
+-- report: warehouse_efficiency
 SELECT 
     w.warehouse_name,
     COUNT(o.order_id) as total_orders,
@@ -220,6 +242,7 @@ ORDER BY total_orders DESC;
 -- ===================================================================
 
 -- Успешность доставок (процент выполненных)
+-- report: delivery_success_rate
 SELECT 
     COUNT(CASE WHEN status = 'Delivered' THEN 1 END) as successful,
     COUNT(CASE WHEN status = 'Failed' THEN 1 END) as failed,
@@ -230,6 +253,7 @@ SELECT
 FROM deliveries;
 
 -- Лучшие маршруты по стабильности
+-- report: route_stability
 SELECT 
     dr.route_name,
     COUNT(s.shipment_id) as total_shipments,
@@ -245,6 +269,7 @@ GROUP BY dr.route_id, dr.route_name
 ORDER BY delivery_rate DESC;
 
 -- Среднее время доставки до городов
+-- report: city_delivery_time
 SELECT 
     d.recipient_city,
     COUNT(d.delivery_id) as deliveries,
@@ -265,6 +290,7 @@ ORDER BY avg_hours DESC;
 -- ===================================================================
 
 -- Дашборд: KPI
+-- report: kpi
 SELECT 
     'Total Orders' as metric,
     COUNT(*)::TEXT as value
@@ -298,6 +324,7 @@ SELECT
 FROM shipments;
 
 -- Детальный отчет по заказам
+-- report: order_details
 SELECT 
     o.order_number,
     c.company_name as customer,
@@ -323,6 +350,7 @@ ORDER BY o.order_date DESC;
 -- ===================================================================
 
 -- Для Tableau/Power BI: Fact Table доставок
+-- report: shipment_facts
 SELECT 
     s.shipment_id,
     o.order_number,
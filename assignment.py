@@ -0,0 +1,279 @@
+"""
+Автоматическое назначение водителей и ТС ожидающим заказам.
+
+Заказы без отправки блокируются FOR UPDATE SKIP LOCKED: параллельный запрос
+другого диспетчера их пропускает. Водители и ТС читаются без блокировок,
+а после подбора занимаются одним UPDATE ... SET is_available = false только
+для тех, кто в плане и ещё свободен (RETURNING - кого удалось занять).
+Заказы, у которых водителя или ТС перехватил другой диспетчер, подбираются
+заново из оставшихся, не больше CLAIM_ROUNDS раз; занятые, но не пригодившиеся
+водители и ТС освобождаются. Блокируется столько строк, сколько назначено.
+Когда отправка доставлена или отменена, её водитель и ТС снова становятся
+свободными (release_shipments).
+
+Подбор идёт в памяти процесса:
+- заказы обрабатываются по приоритету, затем по дате доставки и весу;
+- ТС хранятся по возрастанию вместимости (кг, м³), заказу достаётся самое
+  маленькое подходящее (двоичный поиск по весу, затем проверка объёма);
+- водители лежат в куче по рейтингу и стажу, срочные заказы получают лучших;
+- маршрут - из delivery_routes по городу склада и городу клиента.
+"""
+
+from bisect import bisect_left
+import heapq
+import time
+
+PENDING_STATUSES = ("Ожидает", "Pending")
+# Отправка в этих статусах больше не держит водителя и ТС
+FINAL_STATUSES = ("Доставлено", "Delivered", "Отменено", "Не доставлено", "Failed")
+
+# Меньше - важнее; неизвестный приоритет считается обычным
+PRIORITY_RANK = {
+    "Срочный": 0, "Urgent": 0,
+    "Высокий": 1, "High": 1,
+    "Обычный": 2, "Normal": 2,
+    "Низкий": 3, "Low": 3,
+}
+
+NO_DRIVER = "Нет свободного водителя"
+NO_VEHICLE = "Нет свободного ТС подходящей вместимости"
+NO_ROUTE = "Нет маршрута между городом склада и городом клиента"
+NO_CLAIM = "Подходящих водителя или ТС заняли параллельные назначения"
+
+# Попыток занять водителей и ТС для заказов, проигравших параллельному назначению
+CLAIM_ROUNDS = 3
+
+
+class VehicleIndex:
+    """Свободные ТС по возрастанию (capacity_kg, capacity_cubic_m)"""
+
+    def __init__(self, vehicles):
+        self._items = sorted((float(kg), float(m3), vehicle_id) for vehicle_id, kg, m3 in vehicles)
+        self._weights = [item[0] for item in self._items]
+
+    def __len__(self):
+        return len(self._items)
+
+    def take(self, weight, volume):
+        """Забрать самое маленькое ТС, вмещающее weight кг и volume м³ (или None)"""
+        for i in range(bisect_left(self._weights, weight), len(self._items)):
+            if self._items[i][1] >= volume:
+                del self._weights[i]
+                return self._items.pop(i)[2]
+        return None
+
+
+class DriverPool:
+    """Свободные водители: сначала с большим рейтингом, затем с большим стажем"""
+
+    def __init__(self, drivers):
+        self._heap = [(-float(rating or 0), -(experience or 0), driver_id)
+                      for driver_id, rating, experience in drivers]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def take(self):
+        return heapq.heappop(self._heap)[2] if self._heap else None
+
+
+def plan(orders, drivers, vehicles, routes, default_route_id=None):
+    """
+    Назначения для заказов.
+
+    orders - (order_id, priority, delivery_date, вес, объём, стоимость, город склада, город клиента),
+    drivers - (driver_id, rating, experience_years), vehicles - (vehicle_id, capacity_kg, capacity_cubic_m),
+    routes - (route_id, start_location, end_location, distance_km). Результат - (назначения, отказы):
+    словари с order_id, driver_id, vehicle_id, route_id, cost и order_id, reason.
+    """
+    driver_pool = DriverPool(drivers)
+    vehicle_index = VehicleIndex(vehicles)
+    # Из нескольких маршрутов между городами берётся самый короткий
+    route_by_cities = {}
+    for route_id, start, end, _ in sorted(routes, key=lambda r: r[3], reverse=True):
+        route_by_cities[(start, end)] = route_id
+
+    ordered = sorted(orders, key=lambda o: (PRIORITY_RANK.get(o[1], 2), o[2], -float(o[3] or 0), o[0]))
+    assigned, rejected = [], []
+    for order_id, _, _, weight, volume, cost, warehouse_city, customer_city in ordered:
+        route_id = route_by_cities.get((warehouse_city, customer_city), default_route_id)
+        if route_id is None:
+            rejected.append({"order_id": order_id, "reason": NO_ROUTE})
+            continue
+        if not driver_pool:
+            rejected.append({"order_id": order_id, "reason": NO_DRIVER})
+            continue
+        vehicle_id = vehicle_index.take(float(weight or 0), float(volume or 0))
+        if vehicle_id is None:
+            rejected.append({"order_id": order_id, "reason": NO_VEHICLE})
+            continue
+        assigned.append({
+            "order_id": order_id,
+            "driver_id": driver_pool.take(),
+            "vehicle_id": vehicle_id,
+            "route_id": route_id,
+            "cost": cost,
+        })
+    return assigned, rejected
+
+
+def settle(planned, drivers, vehicles):
+    """
+    Разобрать план после попытки занять ресурсы. drivers и vehicles - id, которые
+    удалось занять. Результат - (назначения, id заказов для повторного подбора,
+    занятые водители и ТС из проигравших назначений, которые можно отдать другим).
+    """
+    won, lost, spare_drivers, spare_vehicles = [], [], [], []
+    for item in planned:
+        has_driver, has_vehicle = item["driver_id"] in drivers, item["vehicle_id"] in vehicles
+        if has_driver and has_vehicle:
+            won.append(item)
+            continue
+        lost.append(item["order_id"])
+        if has_driver:
+            spare_drivers.append(item["driver_id"])
+        if has_vehicle:
+            spare_vehicles.append(item["vehicle_id"])
+    return won, lost, spare_drivers, spare_vehicles
+
+
+def lock_orders(cur, order_ids=None, limit=1000):
+    """
+    Ожидающие заказы без отправки, заблокированные до конца транзакции.
+    Заказы, которые уже держит другая транзакция, пропускаются.
+    """
+    query = """
+        SELECT o.order_id, o.priority, o.delivery_date, o.total_weight_kg, o.total_volume_cubic_m,
+               o.cost, w.city, c.city
+        FROM orders o
+        JOIN warehouses w ON w.warehouse_id = o.warehouse_id
+        JOIN customers c ON c.customer_id = o.customer_id
+        WHERE o.status = ANY(%s)
+          AND NOT EXISTS (SELECT 1 FROM shipments s WHERE s.order_id = o.order_id)
+    """
+    params = [list(PENDING_STATUSES)]
+    if order_ids:
+        query += " AND o.order_id = ANY(%s)"
+        params.append(list(order_ids))
+    query += " ORDER BY o.order_id LIMIT %s FOR UPDATE OF o SKIP LOCKED"
+    params.append(limit)
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+def available(cur):
+    """Свободные водители с действующими правами и свободные ТС (без блокировок)"""
+    cur.execute("""
+        SELECT driver_id, rating, experience_years FROM drivers
+        WHERE is_available = true AND license_expiry_date >= CURRENT_DATE
+    """)
+    drivers = cur.fetchall()
+    cur.execute("SELECT vehicle_id, capacity_kg, capacity_cubic_m FROM vehicles WHERE is_available = true")
+    return drivers, cur.fetchall()
+
+
+def active_routes(cur):
+    cur.execute("""
+        SELECT route_id, start_location, end_location, distance_km FROM delivery_routes
+        WHERE is_active = true
+    """)
+    return cur.fetchall()
+
+
+def claim(cur, table, column, ids):
+    """
+    Пометить занятыми строки ids, которые ещё свободны; возвращает множество занятых.
+    Строки, которые сейчас меняет другая транзакция, пропускаются, а не ждут её:
+    они достанутся ей, и порядок блокировок не важен (нет взаимоблокировок).
+    """
+    if not ids:
+        return set()
+    cur.execute(f"""
+        WITH free AS (
+            SELECT {column} FROM {table}
+            WHERE is_available = true AND {column} = ANY(%s)
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE {table} t SET is_available = false
+        FROM free WHERE t.{column} = free.{column}
+        RETURNING t.{column}
+    """, (list(ids),))
+    return {row[0] for row in cur.fetchall()}
+
+
+def release(cur, table, column, ids):
+    if ids:
+        cur.execute(f"UPDATE {table} SET is_available = true WHERE {column} = ANY(%s)", (list(ids),))
+
+
+def release_shipments(cur, shipment_ids):
+    """
+    Освободить водителей и ТС завершённых отправок shipment_ids. Водитель или ТС,
+    у которых есть другая незавершённая отправка, остаются занятыми.
+    """
+    if not shipment_ids:
+        return
+    final = list(FINAL_STATUSES)
+    for table, column in (("drivers", "driver_id"), ("vehicles", "vehicle_id")):
+        cur.execute(f"""
+            UPDATE {table} t SET is_available = true
+            WHERE t.{column} IN (SELECT s.{column} FROM shipments s
+                                 WHERE s.shipment_id = ANY(%s) AND s.status = ANY(%s))
+              AND NOT EXISTS (SELECT 1 FROM shipments s
+                              WHERE s.{column} = t.{column} AND s.status <> ALL(%s))
+        """, (list(shipment_ids), final, final))
+
+
+def assign(cur, order_ids=None, limit=1000, default_route_id=None, dry_run=False):
+    """
+    Заблокировать заказы, подобрать назначения и занять водителей и ТС (кроме dry_run).
+    Возвращает (назначения, отказы, время подбора в мс).
+    """
+    orders = lock_orders(cur, order_ids, limit)
+    routes = active_routes(cur)
+    assigned, rejected, planning = [], [], 0.0
+    # Занятые этой транзакцией, но не пригодившиеся: id -> строка кандидата
+    spare_drivers, spare_vehicles = {}, {}
+    # Не удалось занять: их держит другая транзакция, даже если они ещё видны свободными
+    busy_drivers, busy_vehicles = set(), set()
+    for _ in range(CLAIM_ROUNDS):
+        drivers, vehicles = available(cur)
+        drivers = [row for row in drivers if row[0] not in busy_drivers]
+        vehicles = [row for row in vehicles if row[0] not in busy_vehicles]
+        started = time.perf_counter()
+        planned, failed = plan(orders, drivers + list(spare_drivers.values()),
+                               vehicles + list(spare_vehicles.values()), routes, default_route_id)
+        planning += time.perf_counter() - started
+        rejected += failed
+        if dry_run:
+            return planned, rejected, round(planning * 1000, 3)
+
+        driver_rows = {row[0]: row for row in drivers}
+        vehicle_rows = {row[0]: row for row in vehicles}
+        wanted_drivers = {a["driver_id"] for a in planned} - spare_drivers.keys()
+        wanted_vehicles = {a["vehicle_id"] for a in planned} - spare_vehicles.keys()
+        claimed_drivers = claim(cur, "drivers", "driver_id", wanted_drivers)
+        claimed_vehicles = claim(cur, "vehicles", "vehicle_id", wanted_vehicles)
+        busy_drivers |= wanted_drivers - claimed_drivers
+        busy_vehicles |= wanted_vehicles - claimed_vehicles
+        won, lost, free_drivers, free_vehicles = settle(planned, claimed_drivers | spare_drivers.keys(),
+                                                        claimed_vehicles | spare_vehicles.keys())
+        assigned += won
+        for item in won:
+            spare_drivers.pop(item["driver_id"], None)
+            spare_vehicles.pop(item["vehicle_id"], None)
+        for driver_id in free_drivers:
+            spare_drivers.setdefault(driver_id, driver_rows.get(driver_id))
+        for vehicle_id in free_vehicles:
+            spare_vehicles.setdefault(vehicle_id, vehicle_rows.get(vehicle_id))
+
+        lost = set(lost)
+        orders = [order for order in orders if order[0] in lost]
+        if not orders:
+            break
+    rejected += [{"order_id": order[0], "reason": NO_CLAIM} for order in orders]
+
+    release(cur, "drivers", "driver_id", spare_drivers)
+    release(cur, "vehicles", "vehicle_id", spare_vehicles)
+    return assigned, rejected, round(planning * 1000, 3)
@@ -0,0 +1,100 @@
+"""
+Проверка пакетов записей для массовой загрузки (POST /api/.../bulk)
+"""
+
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from enum import Enum
+
+
+class BulkMode(str, Enum):
+    """Режим массовой загрузки"""
+    atomic = "atomic"    # всё или ничего: при любой ошибке ничего не записывается
+    partial = "partial"  # корректные записи сохраняются, ошибочные возвращаются с описанием
+
+
+class Field:
+    """Описание поля записи: тип, обязательность, значение по умолчанию, ограничения"""
+
+    __slots__ = ("type", "required", "default", "max_length", "min_value")
+
+    def __init__(self, type_, required=False, default=None, max_length=None, min_value=None):
+        self.type = type_
+        self.required = required
+        self.default = default
+        self.max_length = max_length
+        self.min_value = min_value
+
+    def default_value(self):
+        return self.default() if callable(self.default) else self.default
+
+
+def validate_item(item, fields):
+    """
+    Привести запись к описанию полей.
+    Возвращает кортеж значений в порядке fields; при ошибке - ValueError.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Запись должна быть объектом")
+    unknown = set(item) - set(fields)
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    values = []
+    for name, field in fields.items():
+        value = item.get(name)
+        if value is None:
+            if field.required:
+                raise ValueError(f"Не заполнено поле {name}")
+            values.append(field.default_value())
+            continue
+        try:
+            value = _coerce(field.type, value)
+        except (TypeError, ValueError, InvalidOperation):
+            raise ValueError(f"Некорректное значение поля {name}: {value!r}")
+        if field.max_length is not None and len(value) > field.max_length:
+            raise ValueError(f"Поле {name} длиннее {field.max_length} символов")
+        if field.min_value is not None and value < field.min_value:
+            raise ValueError(f"Поле {name} меньше {field.min_value}")
+        values.append(value)
+    return tuple(values)
+
+
+def validate_batch(items, fields):
+    """
+    Проверить пакет записей.
+    Возвращает (список (индекс, значения) корректных записей, список ошибок).
+    """
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, validate_item(item, fields)))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    return valid, errors
+
+
+def _coerce(type_, value):
+    if type_ is int:
+        if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+            raise ValueError(value)
+        return int(value)
+    if type_ is Decimal:
+        if isinstance(value, bool):
+            raise ValueError(value)
+        value = Decimal(str(value))
+        if not value.is_finite():
+            raise ValueError(value)
+        return value
+    if type_ is bool:
+        if not isinstance(value, bool):
+            raise ValueError(value)
+        return value
+    if type_ is date:
+        return value if isinstance(value, date) else date.fromisoformat(value)
+    if type_ is datetime:
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if type_ is str:
+        if not isinstance(value, str):
+            raise ValueError(value)
+        return value
+    raise TypeError(f"Неподдерживаемый тип поля: {type_}")
@@ -0,0 +1,89 @@
+"""
+In-process кэш с вытеснением по LRU и ограничением времени жизни (TTL)
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с TTL.
+
+    Ключи группируются по пространствам имён (обычно имя таблицы),
+    чтобы при записи в таблицу можно было сбросить все связанные записи.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, namespace, key, default=None):
+        """Значение из кэша или default, если его нет или оно устарело"""
+        full_key = (namespace, key)
+        with self._lock:
+            item = self._data.get(full_key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[full_key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(full_key)
+            self.hits += 1
+            return value
+
+    def set(self, namespace, key, value, ttl=None):
+        """Сохранить значение, вытеснив самые давние записи при переполнении"""
+        full_key = (namespace, key)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[full_key] = (expires_at, value)
+            self._data.move_to_end(full_key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *namespaces):
+        """Удалить все записи указанных пространств имён"""
+        with self._lock:
+            stale = [k for k in self._data if k[0] in namespaces]
+            for k in stale:
+                del self._data[k]
+            self.invalidations += len(stale)
+
+    def expiring(self, within):
+        """Ключи (namespace, key) записей, которые устареют в ближайшие within секунд"""
+        deadline = time.monotonic() + within
+        with self._lock:
+            return [k for k, (expires_at, _) in self._data.items() if expires_at <= deadline]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
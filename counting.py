@@ -0,0 +1,47 @@
+"""
+Подсчёт общего количества строк для списочных эндпоинтов.
+
+Стратегии:
+- exact     - SELECT COUNT(*) по фильтру;
+- estimated - оценка планировщика (EXPLAIN, статистика pg_class/pg_statistic),
+              без чтения таблицы;
+- none      - не считать, total = null.
+
+Результаты кэшируются по (таблица, стратегия, фильтр) и сбрасываются
+при записи в таблицу через invalidate_counts().
+"""
+
+from enum import Enum
+import json
+import os
+
+from cache import TTLCache
+
+
+class CountStrategy(str, Enum):
+    exact = "exact"
+    estimated = "estimated"
+    none = "none"
+
+
+count_cache = TTLCache(
+    maxsize=int(os.getenv("COUNT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("COUNT_CACHE_TTL", "30")),
+)
+
+
+def count_key(strategy, filters):
+    """Ключ кэша для стратегии и набора фильтров"""
+    return (strategy.value, tuple(sorted(filters.items())))
+
+
+def plan_rows(plan):
+    """Оценка числа строк из результата EXPLAIN (FORMAT JSON)"""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def invalidate_counts(*tables):
+    """Сбросить закэшированные количества для таблиц"""
+    count_cache.invalidate(*tables)
@@ -133,6 +133,8 @@ CREATE TABLE delivery (
 CREATE INDEX idx_order_customer ON order_item(customer_id);
 CREATE INDEX idx_order_status ON order_item(status);
 CREATE INDEX idx_order_warehouse ON order_item(warehouse_id);
+-- Курсорная пагинация по (order_date, order_id)
+CREATE INDEX idx_order_date_id ON order_item(order_date, order_id);
 CREATE INDEX idx_delivery_order ON delivery(order_id);
 CREATE INDEX idx_delivery_vehicle ON delivery(vehicle_id);
 CREATE INDEX idx_delivery_driver ON delivery(driver_id);
@@ -143,6 +143,8 @@ CREATE TABLE delivery (
 -- ===================================================================
 CREATE INDEX idx_order_customer ON order_item(customer_id);
 CREATE INDEX idx_order_status ON order_item(status);
+-- Курсорная пагинация по (order_date, order_id)
+CREATE INDEX idx_order_date_id ON order_item(order_date, order_id);
 CREATE INDEX idx_shipment_vehicle ON shipment(vehicle_id);
 CREATE INDEX idx_shipment_driver ON shipment(driver_id);
 CREATE INDEX idx_shipment_status ON shipment(status);
@@ -167,6 +167,8 @@ CREATE TABLE deliveries (
 CREATE INDEX idx_orders_customer ON orders(customer_id);
 CREATE INDEX idx_orders_status ON orders(status);
 CREATE INDEX idx_orders_delivery_date ON orders(delivery_date);
+-- Курсорная пагинация по (order_date, order_id)
+CREATE INDEX idx_orders_date_id ON orders(order_date, order_id);
 CREATE INDEX idx_shipments_vehicle ON shipments(vehicle_id);
 CREATE INDEX idx_shipments_driver ON shipments(driver_id);
 CREATE INDEX idx_shipments_status ON shipments(status);
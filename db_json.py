@@ -0,0 +1,102 @@
+"""
+JSON-ответы списков, собранные в PostgreSQL.
+
+Страница выбирается тем же запросом, что и обычно, а json_agg превращает её
+в один JSON-массив. Даты и отметки времени форматируются to_char в ДД.ММ.ГГГГ,
+как serialize_dates в fastapi_backend_raw_sql.py (datetime - подкласс date,
+поэтому время туда тоже не попадает). Массив читается как текст и уходит
+в тело ответа без разбора и сериализации строк в Python.
+"""
+
+import json
+import os
+
+from cache import TTLCache
+
+# OID типов date, timestamp и timestamptz -> формат to_char
+DATE_FORMATS = {
+    1082: "DD.MM.YYYY",
+    1114: "DD.MM.YYYY",
+    1184: "DD.MM.YYYY",
+}
+
+# Форма запроса (его SELECT-список) -> выражение json_build_object над колонками.
+# Форм столько, сколько комбинаций ?fields, поэтому кэш ограничен (LRU); TTL -
+# чтобы изменение типов колонок подхватывалось без перезапуска
+_objects = TTLCache(maxsize=int(os.getenv("DB_JSON_SHAPE_CACHE_SIZE", "512")), ttl=3600)
+
+
+def _quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _quote_literal(name):
+    return "'" + name.replace("'", "''") + "'"
+
+
+def row_object(cur, query, params, shape):
+    """
+    Выражение json_build_object(...) над колонками query (алиас p).
+    Типы колонок берутся из описания запроса с LIMIT 0 и запоминаются
+    по shape - тому, что определяет колонки (SELECT ... FROM ... без WHERE),
+    поэтому лишний запрос выполняется один раз на форму, а не на каждый фильтр.
+    """
+    expression = _objects.get("shape", shape)
+    if expression is not None:
+        return expression
+    cur.execute(f"SELECT * FROM ({query}) p LIMIT 0", params)
+    fields = []
+    for column in cur.description:
+        value = "p." + _quote_ident(column.name)
+        if column.type_code in DATE_FORMATS:
+            value = f"to_char({value}, '{DATE_FORMATS[column.type_code]}')"
+        fields.append(f"{_quote_literal(column.name)}, {value}")
+    expression = "json_build_object(" + ", ".join(fields) + ")"
+    _objects.set("shape", shape, expression)
+    return expression
+
+
+def page_json(conn, query, params, shape, limit=None, key=()):
+    """
+    Страница запроса query одним JSON-массивом (текст).
+
+    query выбирает limit + 1 строк, как для split_page: в массив попадают
+    первые limit, а если есть лишняя строка, возвращаются и значения колонок
+    key последней строки страницы для курсора. Результат - (массив, ключ или None).
+    """
+    cur = conn.cursor()
+    params = list(params)
+    expression = row_object(cur, query, params, shape)
+    # row_number() OVER () нумерует строки в порядке ORDER BY подзапроса
+    source = f"(SELECT q.*, row_number() OVER () AS page_row FROM ({query}) q) p"
+    if limit is None:
+        cur.execute(f"SELECT COALESCE(json_agg({expression} ORDER BY p.page_row), '[]')::text FROM {source}",
+                    params)
+        return cur.fetchone()[0], None
+    last = "".join(f", (array_agg(p.{_quote_ident(c)}) FILTER (WHERE p.page_row = %s))[1]" for c in key)
+    cur.execute(f"""
+        SELECT COALESCE(json_agg({expression} ORDER BY p.page_row) FILTER (WHERE p.page_row <= %s), '[]')::text
+               {last}, COUNT(*) > %s
+        FROM {source}
+    """, [limit] * (len(key) + 2) + params)
+    data, *values, more = cur.fetchone()
+    return data, tuple(values) if more else None
+
+
+def row_json(conn, query, params, shape):
+    """Первая строка запроса query JSON-объектом (текст) или None"""
+    cur = conn.cursor()
+    params = list(params)
+    expression = row_object(cur, query, params, shape)
+    cur.execute(f"SELECT {expression}::text FROM ({query}) p LIMIT 1", params)
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def page_body(total, data, next_cursor):
+    """Тело ответа списка {"total", "data", "next_cursor"} с готовым массивом data"""
+    return (
+        '{"total":' + json.dumps(total)
+        + ',"data":' + data
+        + ',"next_cursor":' + json.dumps(next_cursor) + "}"
+    ).encode()
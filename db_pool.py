@@ -0,0 +1,281 @@
+"""
+Пул подключений к PostgreSQL для бэкенда на чистом SQL (psycopg2)
+"""
+
+from collections import deque
+from contextlib import contextmanager
+import logging
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+logger = logging.getLogger(__name__)
+
+
+class PoolError(Exception):
+    """Базовая ошибка пула подключений"""
+
+
+class PoolTimeoutError(PoolError):
+    """Подключение не освободилось за отведённое время"""
+
+
+class PoolQueueFullError(PoolError):
+    """Очередь ожидания подключений переполнена"""
+
+
+class PoolConnectError(PoolError):
+    """Не удалось открыть новое подключение к БД"""
+
+
+class _ConnInfo:
+    __slots__ = ("created_at", "last_used")
+
+    def __init__(self):
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул подключений psycopg2.
+
+    - min_size подключений открываются заранее, не больше max_size одновременно;
+    - при выдаче подключение, простаивавшее дольше ping_after секунд,
+      проверяется запросом SELECT 1;
+    - подключения старше max_lifetime секунд закрываются и пересоздаются;
+    - не больше max_waiting запросов ждут свободное подключение,
+      каждый не дольше timeout секунд.
+    """
+
+    def __init__(self, dsn, min_size=2, max_size=10, timeout=5.0,
+                 max_lifetime=1800.0, max_waiting=100, ping_after=30.0, connection_factory=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Некорректные размеры пула: min_size=%s, max_size=%s" % (min_size, max_size))
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_waiting = max_waiting
+        self.ping_after = ping_after
+        self.connection_factory = connection_factory
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._info = {}
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+            "rejected": 0,
+            "failed_health_checks": 0,
+            "wait_time_total_ms": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls, dsn, prefix="DB_POOL_", **kwargs):
+        """Создать пул с настройками из переменных окружения"""
+        return cls(
+            dsn,
+            min_size=int(os.getenv(prefix + "MIN_SIZE", "2")),
+            max_size=int(os.getenv(prefix + "MAX_SIZE", "10")),
+            timeout=float(os.getenv(prefix + "TIMEOUT", "5")),
+            max_lifetime=float(os.getenv(prefix + "MAX_LIFETIME", "1800")),
+            max_waiting=int(os.getenv(prefix + "MAX_WAITING", "100")),
+            ping_after=float(os.getenv(prefix + "PING_AFTER", "30")),
+            **kwargs,
+        )
+
+    # ----- открытие / закрытие -----
+
+    def open(self):
+        """Заранее открыть min_size подключений"""
+        with self._cond:
+            self._closed = False
+            missing = max(self.min_size - self._size, 0)
+            self._size += missing
+        for _ in range(missing):
+            try:
+                conn = self._connect()
+            except psycopg2.Error as e:
+                with self._cond:
+                    self._size -= 1
+                logger.warning(f"Не удалось заранее открыть подключение: {e}")
+                continue
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def close(self):
+        """Закрыть все свободные подключения; занятые закроются при возврате"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    # ----- выдача / возврат -----
+
+    def getconn(self, timeout=None):
+        """Получить подключение из пула"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("Пул подключений закрыт")
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    if self._waiting >= self.max_waiting:
+                        self._counters["rejected"] += 1
+                        raise PoolQueueFullError(
+                            f"Очередь ожидания подключений переполнена ({self.max_waiting})"
+                        )
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"Нет свободного подключения к БД за {timeout:.1f} с"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception as e:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    if isinstance(e, psycopg2.Error):
+                        raise PoolConnectError(f"Не удалось подключиться к БД: {e}") from e
+                    raise
+            elif not self._is_usable(conn):
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                self._discard(conn)
+                continue
+
+            now = time.monotonic()
+            self._info[conn].last_used = now
+            with self._cond:
+                self._counters["checkouts"] += 1
+                self._counters["wait_time_total_ms"] += (now - started) * 1000
+            return conn
+
+    def putconn(self, conn):
+        """Вернуть подключение в пул"""
+        keep = not conn.closed
+        if keep:
+            status = conn.get_transaction_status()
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                keep = False
+            elif status != TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    keep = False
+        info = self._info.get(conn)
+        if keep and info is not None and time.monotonic() - info.created_at > self.max_lifetime:
+            keep = False
+
+        with self._cond:
+            if keep and not self._closed:
+                info.last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._size -= 1
+                keep = False
+            self._cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Контекстный менеджер: взять подключение и вернуть его в пул"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    # ----- статистика -----
+
+    def stats(self):
+        """Текущее состояние пула и накопленные счётчики"""
+        with self._cond:
+            idle = len(self._idle)
+            checkouts = self._counters["checkouts"]
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "waiting": self._waiting,
+                "max_waiting": self.max_waiting,
+                **{k: v for k, v in self._counters.items() if k != "wait_time_total_ms"},
+                "avg_wait_ms": round(self._counters["wait_time_total_ms"] / checkouts, 3) if checkouts else 0.0,
+            }
+
+    # ----- внутреннее -----
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=self.connection_factory)
+        self._info[conn] = _ConnInfo()
+        with self._cond:
+            self._counters["connections_created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        self._info.pop(conn, None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._counters["connections_closed"] += 1
+
+    def _is_usable(self, conn):
+        """Проверка подключения перед выдачей"""
+        if conn.closed:
+            return False
+        info = self._info[conn]
+        now = time.monotonic()
+        if now - info.created_at > self.max_lifetime:
+            return False
+        if now - info.last_used < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Подключение не прошло проверку и будет закрыто: {e}")
+            with self._cond:
+                self._counters["failed_health_checks"] += 1
+            return False
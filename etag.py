@@ -0,0 +1,90 @@
+"""
+ETag и условные GET-запросы по версиям таблиц.
+
+Версии хранятся в таблице table_version и увеличиваются триггерами
+(migrations/002_table_versions.sql). ETag строится из версий таблиц,
+на которых основан ответ, пути и параметров запроса - тело ответа
+для этого не сериализуется и не хешируется. Если ETag совпал с
+If-None-Match, отвечаем 304 до выполнения запроса страницы.
+"""
+
+import hashlib
+import logging
+import time
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Если таблицы table_version нет (миграция не применена), ETag отключаются
+# и проверка повторяется не чаще раза в VERSIONS_RETRY секунд
+VERSIONS_RETRY = 60.0
+_disabled_until = 0.0
+
+
+class TableVersions:
+    """
+    Версии таблиц, прочитанные для запроса, и ETag ответа.
+    Версии также входят в ключи in-process кэшей, чтобы кэш процесса
+    не отдавал данные, изменённые через другой процесс.
+    """
+
+    __slots__ = ("etag", "versions")
+
+    def __init__(self, etag=None, versions=None):
+        self.etag = etag
+        self.versions = versions
+
+    def get(self, table):
+        """Версия таблицы (None, если версии недоступны)"""
+        return None if self.versions is None else self.versions.get(table, 0)
+
+
+def versions_enabled():
+    return time.monotonic() >= _disabled_until
+
+
+def disable_versions(error):
+    global _disabled_until
+    _disabled_until = time.monotonic() + VERSIONS_RETRY
+    logger.warning(f"Версии таблиц недоступны, ETag отключены (примените migrate.py): {error}")
+
+
+def make_etag(request, tables, versions):
+    """Сильный ETag: путь, параметры запроса и версии таблиц"""
+    parts = [request.url.path, str(sorted(request.query_params.multi_items()))]
+    parts += [f"{table}={versions.get(table, 0)}" for table in sorted(tables)]
+    return '"' + hashlib.blake2b("\n".join(parts).encode(), digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
+
+def etag_headers(versions):
+    """
+    Заголовки ETag для ответа, который обработчик возвращает сам: FastAPI не
+    переносит в него заголовки, выставленные в apply_etag на внедрённый Response
+    """
+    return {"ETag": versions.etag, "Cache-Control": "no-cache"} if versions.etag else None
+
+
+def apply_etag(request, response, tables, versions):
+    """
+    Выставить ETag ответа или прервать запрос ответом 304.
+    versions - {таблица: версия} или None, если версии недоступны.
+    """
+    if versions is None:
+        return TableVersions()
+    etag = make_etag(request, tables, versions)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return TableVersions(etag, versions)
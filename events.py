@@ -0,0 +1,194 @@
+"""
+События смены статуса заказов, отправок и доставок.
+
+Триггер migrations/006_status_events.sql отправляет NOTIFY в канал
+status_events после фиксации транзакции. В каждом процессе API один поток
+(EventHub) держит отдельное подключение с LISTEN и раздаёт события
+подписчикам SSE и WebSocket, отбирая их по сущности, складу и водителю.
+
+У подписчика очередь на EVENTS_QUEUE_SIZE событий. Если клиент читает
+медленнее, чем приходят события, и очередь заполнилась, подписка закрывается:
+клиент переподключается и перечитывает список, а память процесса не растёт.
+События, пришедшие, пока подключение LISTEN восстанавливается, теряются.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+
+import psycopg2
+
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "status_events"
+ENTITIES = ("orders", "shipments", "deliveries")
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+EVENTS_RECONNECT_DELAY = float(os.getenv("EVENTS_RECONNECT_DELAY", "2"))
+
+SUBSCRIBERS = Gauge("events_subscribers", "Подключённые подписчики событий статусов", ("transport",))
+RECEIVED = Counter("events_received_total", "События статусов, полученные через LISTEN", ("entity",))
+DROPPED = Counter("events_dropped_subscribers_total",
+                  "Подписки, закрытые из-за переполнения очереди", ("transport",))
+
+
+class Subscription:
+    """Подписка одного клиента: фильтры и ограниченная очередь в его цикле событий"""
+
+    def __init__(self, loop, transport, entity=None, warehouse_id=None, driver_id=None,
+                 maxsize=EVENTS_QUEUE_SIZE):
+        self.loop = loop
+        self.transport = transport
+        self.entity = entity
+        self.warehouse_id = warehouse_id
+        self.driver_id = driver_id
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    def matches(self, event):
+        return ((self.entity is None or event.get("entity") == self.entity)
+                and (self.warehouse_id is None or event.get("warehouse_id") == self.warehouse_id)
+                and (self.driver_id is None or event.get("driver_id") == self.driver_id))
+
+    def push(self, message):
+        """Положить событие в очередь (вызывается в цикле событий подписчика)"""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Накопленное клиенту уже не нужно: оставляем только сигнал закрытия
+            self.dropped = True
+            DROPPED.inc(self.transport)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout):
+        """Следующее событие (JSON), "" - событий не было timeout секунд, None - подписка закрыта"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return ""
+
+
+class EventHub:
+    """Слушатель канала status_events и его подписчики"""
+
+    def __init__(self, dsn, channel=CHANNEL, reconnect_delay=EVENTS_RECONNECT_DELAY):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self.received = 0
+        self.dropped = 0
+        self.last_error = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="status-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # ----- подписчики -----
+
+    def subscribe(self, transport, entity=None, warehouse_id=None, driver_id=None):
+        """Новая подписка; вызывать из корутины, в цикле которой будут читаться события"""
+        if entity is not None and entity not in ENTITIES:
+            raise ValueError(f"Неизвестная сущность '{entity}', допустимы: {', '.join(ENTITIES)}")
+        subscription = Subscription(asyncio.get_running_loop(), transport, entity, warehouse_id, driver_id)
+        with self._lock:
+            self._subscribers.add(subscription)
+        SUBSCRIBERS.inc(transport)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription not in self._subscribers:
+                return
+            self._subscribers.discard(subscription)
+        SUBSCRIBERS.dec(subscription.transport)
+        if subscription.dropped:
+            self.dropped += 1
+
+    def publish(self, payload):
+        """Разослать событие (текст JSON из NOTIFY) подходящим подписчикам"""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Некорректное событие в канале {self.channel}: {payload[:200]}")
+            return
+        self.received += 1
+        RECEIVED.inc(event.get("entity", ""))
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.matches(event)]
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, payload)
+            except RuntimeError:
+                # Цикл событий подписчика уже закрыт
+                self.unsubscribe(subscription)
+
+    # ----- LISTEN -----
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.channel}")
+                self.connected, self.last_error = True, None
+                logger.info(f"Подписка на канал {self.channel} активна")
+                self._listen(conn)
+            except psycopg2.Error as e:
+                if self.connected or self.last_error is None:
+                    logger.warning(f"Канал {self.channel} недоступен: {e}")
+                self.last_error = str(e).strip()
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+            self._stop.wait(self.reconnect_delay)
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            # Таймаут нужен только для того, чтобы вовремя заметить stop()
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                self.publish(conn.notifies.pop(0).payload)
+
+    def stats(self):
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {
+            "channel": self.channel,
+            "connected": self.connected,
+            "subscribers": subscribers,
+            "received": self.received,
+            "dropped_subscribers": self.dropped,
+            "queue_size": EVENTS_QUEUE_SIZE,
+            "last_error": self.last_error,
+        }
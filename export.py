@@ -0,0 +1,96 @@
+"""
+Потоковая выгрузка больших таблиц (NDJSON / CSV) через серверный курсор.
+
+Строки читаются из именованного курсора PostgreSQL блоками фиксированного
+размера (FETCH FORWARD n) и сразу кодируются и отдаются клиенту, поэтому
+расход памяти не зависит от размера таблицы.
+"""
+
+import csv
+import io
+import json
+import uuid
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv; charset=utf-8",
+}
+
+
+def export_value(value):
+    """Значение для выгрузки: даты в ISO 8601, суммы - числами"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def fetch_batches(conn, query, params, batch_size):
+    """
+    Выполнить запрос в именованном (серверном) курсоре и отдавать
+    (имена колонок, блок строк) по batch_size строк.
+    Первый блок отдаётся всегда, даже пустой, чтобы в CSV был заголовок.
+    """
+    cur = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+    try:
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            yield [c[0] for c in cur.description], rows
+            if len(rows) < batch_size:
+                break
+    finally:
+        cur.close()
+
+
+def encode_ndjson(batches):
+    for columns, rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, map(export_value, row))), ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode()
+
+
+def encode_csv(batches):
+    header_written = False
+    for columns, rows in batches:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows([export_value(v) for v in row] for row in rows)
+        yield buf.getvalue().encode()
+
+
+ENCODERS = {
+    ExportFormat.ndjson: encode_ndjson,
+    ExportFormat.csv: encode_csv,
+}
+
+
+def gzip_chunks(chunks, level=6):
+    """Сжать поток байтов в формат gzip, не накапливая его в памяти"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(conn, query, params, fmt, batch_size, compress=False):
+    """Генератор байтов выгрузки в формате fmt (опционально gzip)"""
+    chunks = ENCODERS[fmt](fetch_batches(conn, query, params, batch_size))
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,168 @@
+"""
+Выборочные поля ответа (?fields=order_id,status,customer_name).
+
+Для каждой сущности задан допустимый список полей: выражение SQL и JOIN,
+без которых его не получить. Запрошенные поля попадают в SELECT, а JOIN
+добавляются только для них, поэтому неиспользуемые таблицы не читаются вовсе.
+"""
+
+
+class InvalidFieldsError(ValueError):
+    """Запрошено поле, которого нет в списке допустимых"""
+
+
+class FieldSet:
+    """
+    Поля сущности.
+
+    fields - пары (имя, выражение) или (имя, выражение, алиас JOIN) в порядке
+    ответа; joins - пары (алиас, текст JOIN) в порядке, в котором их можно
+    подключать (JOIN может ссылаться на алиасы предыдущих); depends - алиас JOIN
+    -> алиас, от которого он зависит. default - поля ответа без ?fields,
+    required - поля, которые нужны всегда (ключ курсора).
+    """
+
+    def __init__(self, source, fields, joins=(), depends=None, default=None, required=()):
+        self.source = source
+        self.fields = {}
+        for name, expression, *join in fields:
+            self.fields[name] = (expression, join[0] if join else None)
+        self.joins = list(joins)
+        self.depends = depends or {}
+        self.default = tuple(default or self.fields)
+        self.required = tuple(required)
+
+    def parse(self, value, default=None):
+        """Кортеж полей из значения ?fields (None - default или поля по умолчанию)"""
+        if value is None:
+            return default or self.default
+        names = []
+        for name in value.split(","):
+            name = name.strip()
+            if not name:
+                continue
+            if name not in self.fields:
+                raise InvalidFieldsError(
+                    f"Неизвестное поле '{name}', допустимы: {', '.join(self.fields)}")
+            if name not in names:
+                names.append(name)
+        if not names:
+            raise InvalidFieldsError("Пустой список полей")
+        return tuple(names)
+
+    def select(self, names, required=()):
+        """SELECT ... FROM ... с нужными JOIN для полей names (плюс обязательные)"""
+        # Обязательные поля могут совпадать с запрошенными и друг с другом: каждое - один раз
+        names = list(dict.fromkeys(tuple(names) + self.required + tuple(required)))
+        aliases = set()
+        for name in names:
+            alias = self.fields[name][1]
+            while alias and alias not in aliases:
+                aliases.add(alias)
+                alias = self.depends.get(alias)
+        columns = []
+        for name in names:
+            expression = self.fields[name][0]
+            columns.append(expression if expression.rsplit(".", 1)[-1] == name else f"{expression} as {name}")
+        joins = "".join(f"\n{join}" for alias, join in self.joins if alias in aliases)
+        return f"SELECT {', '.join(columns)}\nFROM {self.source}{joins}"
+
+
+def table_fields(prefix, columns):
+    """Поля, которые берутся из основной таблицы как есть"""
+    return [(column, f"{prefix}{column}") for column in columns]
+
+
+EMPLOYEE_COLUMNS = ("employee_id", "full_name", "position", "email", "phone", "hire_date",
+                    "salary", "is_active", "created_at")
+CUSTOMER_COLUMNS = ("customer_id", "company_name", "contact_person", "email", "phone", "city",
+                    "address", "postal_code", "registration_date", "is_active", "created_at")
+VEHICLE_COLUMNS = ("vehicle_id", "license_plate", "vehicle_type", "brand", "model", "year",
+                   "capacity_kg", "capacity_cubic_m", "mileage", "last_maintenance", "is_available",
+                   "created_at")
+WAREHOUSE_COLUMNS = ("warehouse_id", "warehouse_name", "city", "address", "postal_code", "manager_id",
+                     "capacity_items", "current_items", "phone", "email", "is_active", "created_at")
+ROUTE_COLUMNS = ("route_id", "route_name", "start_location", "end_location", "distance_km",
+                 "estimated_duration_hours", "is_active", "created_at")
+
+EMPLOYEES = FieldSet("employees", table_fields("", EMPLOYEE_COLUMNS), required=("employee_id",))
+
+CUSTOMERS = FieldSet(
+    "customers",
+    table_fields("", CUSTOMER_COLUMNS),
+    default=CUSTOMER_COLUMNS[:-1],
+    required=("customer_id",),
+)
+
+VEHICLES = FieldSet("vehicles", table_fields("", VEHICLE_COLUMNS), required=("vehicle_id",))
+
+# drivers.employee_id - NOT NULL с внешним ключом, поэтому без full_name
+# JOIN employees можно не делать: строк столько же
+DRIVERS = FieldSet(
+    "drivers d",
+    table_fields("d.", ("driver_id", "employee_id"))
+    + [("full_name", "e.full_name", "e")]
+    + table_fields("d.", ("license_number", "license_expiry_date", "experience_years", "rating",
+                          "is_available")),
+    joins=[("e", "JOIN employees e ON d.employee_id = e.employee_id")],
+    required=("driver_id",),
+)
+
+WAREHOUSES = FieldSet(
+    "warehouses",
+    table_fields("", WAREHOUSE_COLUMNS),
+    default=("warehouse_id", "warehouse_name", "city", "address", "postal_code",
+             "capacity_items", "current_items", "phone", "email"),
+    required=("warehouse_id",),
+)
+
+ROUTES = FieldSet(
+    "delivery_routes",
+    table_fields("", ROUTE_COLUMNS),
+    default=ROUTE_COLUMNS[:6],
+    required=("route_id",),
+)
+
+ORDERS = FieldSet(
+    "orders o",
+    table_fields("o.", ("order_id", "order_number", "customer_id"))
+    + [("customer_name", "c.contact_person", "c")]
+    + table_fields("o.", ("warehouse_id", "order_date", "delivery_date", "total_weight_kg",
+                          "total_volume_cubic_m", "status", "priority", "cost", "notes")),
+    joins=[("c", "LEFT JOIN customers c ON o.customer_id = c.customer_id")],
+    required=("order_id",),
+)
+
+SHIPMENTS = FieldSet(
+    "shipments s",
+    table_fields("s.", ("shipment_id", "shipment_number", "order_id"))
+    + [("order_number", "o.order_number", "o")]
+    + table_fields("s.", ("vehicle_id",))
+    + [("license_plate", "v.license_plate", "v")]
+    + table_fields("s.", ("driver_id",))
+    + [("driver_name", "e.full_name", "e")]
+    + table_fields("s.", ("route_id",))
+    + [("route_name", "dr.route_name", "dr")]
+    + table_fields("s.", ("departure_time", "expected_arrival_time", "actual_arrival_time", "status",
+                          "distance_traveled_km", "fuel_consumed_liters", "cost")),
+    joins=[
+        ("o", "LEFT JOIN orders o ON s.order_id = o.order_id"),
+        ("v", "LEFT JOIN vehicles v ON s.vehicle_id = v.vehicle_id"),
+        ("d", "LEFT JOIN drivers d ON s.driver_id = d.driver_id"),
+        ("e", "LEFT JOIN employees e ON d.employee_id = e.employee_id"),
+        ("dr", "LEFT JOIN delivery_routes dr ON s.route_id = dr.route_id"),
+    ],
+    depends={"e": "d"},
+    required=("shipment_id",),
+)
+
+DELIVERIES = FieldSet(
+    "deliveries del",
+    table_fields("del.", ("delivery_id", "shipment_id"))
+    + [("shipment_number", "s.shipment_number", "s")]
+    + table_fields("del.", ("recipient_name", "recipient_phone", "recipient_address", "recipient_city",
+                            "delivery_time", "signature_required", "signature_obtained", "status",
+                            "attempts")),
+    joins=[("s", "LEFT JOIN shipments s ON del.shipment_id = s.shipment_id")],
+    required=("delivery_id",),
+)
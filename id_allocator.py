@@ -0,0 +1,54 @@
+"""
+Выдача идентификаторов из последовательностей PostgreSQL блоками.
+
+Вместо SELECT MAX(id) + 1 (чтение индекса и конфликты первичного ключа при
+параллельной записи) значения берутся из последовательности SERIAL-колонки:
+процесс забирает сразу блок nextval и раздаёт его из памяти. nextval
+не блокирует другие транзакции, поэтому параллельные создания не конфликтуют.
+Идентификаторы уникальны, но не непрерывны: при откате транзакции
+или перезапуске процесса неиспользованные значения пропадают.
+"""
+
+from collections import deque
+import threading
+
+
+class IdBlockAllocator:
+    """Потокобезопасный запас значений последовательности SERIAL-колонки table.column"""
+
+    def __init__(self, table, column, block_size=50):
+        self.table = table
+        self.column = column
+        self.block_size = block_size
+        self._ids = deque()
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def take(self, cur, count=1):
+        """Выдать count идентификаторов; при нехватке добрать блок через курсор cur"""
+        with self._lock:
+            ids = [self._ids.popleft() for _ in range(min(count, len(self._ids)))]
+        missing = count - len(ids)
+        if missing:
+            # Запрос к БД - вне блокировки, чтобы другие потоки брали остаток запаса
+            fetched = self._fetch(cur, missing + self.block_size)
+            ids += fetched[:missing]
+            with self._lock:
+                self._ids.extend(fetched[missing:])
+                self.fetches += 1
+        return ids
+
+    def _fetch(self, cur, count):
+        cur.execute("SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+                    (self.table, self.column, count))
+        return [row[0] for row in cur.fetchall()]
+
+    def stats(self):
+        with self._lock:
+            return {"table": self.table, "prefetched": len(self._ids),
+                    "block_size": self.block_size, "fetches": self.fetches}
+
+
+def format_number(prefix, year, id_):
+    """Номер документа вида ORD-2024-00001"""
+    return f"{prefix}-{year}-{id_:05d}"
@@ -0,0 +1,79 @@
+"""
+Ключи идемпотентности (заголовок Idempotency-Key) для создающих запросов.
+
+Ключ записывается в таблицу idempotency_keys в той же транзакции, что и
+создаваемые записи, вместе с ответом. Повтор запроса с тем же ключом
+получает сохранённый ответ и ничего не создаёт. Если первый запрос ещё
+выполняется, повтор ждёт его завершения на уникальном индексе; если первый
+запрос откатился, ключ свободен и повтор выполняется заново.
+Таблица создаётся миграцией migrations/004_id_allocation.sql.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+import hashlib
+import json
+import os
+import time
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+MAX_KEY_LENGTH = 255
+
+# Устаревшие ключи удаляются не чаще раза в PURGE_INTERVAL секунд на процесс
+PURGE_INTERVAL = 600.0
+_next_purge = 0.0
+
+
+class IdempotencyError(Exception):
+    """Ключ некорректен или уже использован с другим телом запроса"""
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Не сериализуется: {type(value)}")
+
+
+def payload_hash(payload):
+    """Хеш тела запроса: повтор с тем же ключом, но другим телом - ошибка клиента"""
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_default)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def claim(cur, scope, key, payload):
+    """
+    Занять ключ в текущей транзакции.
+    Возвращает None, если запрос нужно выполнить, или сохранённый ответ повтора.
+    """
+    global _next_purge
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(f"Idempotency-Key должен быть от 1 до {MAX_KEY_LENGTH} символов")
+    if time.monotonic() >= _next_purge:
+        _next_purge = time.monotonic() + PURGE_INTERVAL
+        cur.execute("DELETE FROM idempotency_keys WHERE created_at < NOW() - make_interval(secs => %s)",
+                    (IDEMPOTENCY_KEY_TTL_HOURS * 3600,))
+
+    digest = payload_hash(payload)
+    cur.execute("""
+        INSERT INTO idempotency_keys (scope, key, request_hash)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (scope, key) DO NOTHING
+        RETURNING key
+    """, (scope, key, digest))
+    if cur.fetchone() is not None:
+        return None
+    cur.execute("SELECT request_hash, response FROM idempotency_keys WHERE scope = %s AND key = %s",
+                (scope, key))
+    row = cur.fetchone()
+    stored_hash, response = (row["request_hash"], row["response"]) if isinstance(row, dict) else row
+    if stored_hash != digest:
+        raise IdempotencyError("Idempotency-Key уже использован с другим телом запроса")
+    return response
+
+
+def save(cur, scope, key, response):
+    """Сохранить ответ для повторов; коммитится вместе с созданными записями"""
+    cur.execute("UPDATE idempotency_keys SET response = %s WHERE scope = %s AND key = %s",
+                (json.dumps(response, ensure_ascii=False, default=_default), scope, key))
@@ -0,0 +1,331 @@
+"""
+Метрики API в текстовом формате Prometheus (GET /metrics).
+
+- MetricsMiddleware считает запросы, задержки, коды ответа и запросы в работе
+  по шаблону маршрута (/api/orders/{order_id}), а не по фактическому пути;
+- время и число SQL-запросов каждого HTTP-запроса собираются событиями
+  SQLAlchemy (instrument_engine) или курсором psycopg2 (TimedConnection);
+- состояние пулов подключений снимается в момент запроса /metrics.
+
+Метрики хранятся в памяти процесса: при нескольких воркерах uvicorn
+у каждого свои значения.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+
+import psycopg2.extensions
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _metrics.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values):
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels, value):
+        yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self):
+        # Копия состояния, чтобы не держать блокировку во время форматирования
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, counts, total in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            plain = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain} {_format_value(total)}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+def register_collector(collect):
+    """
+    Добавить источник значений, снимаемых при каждом запросе /metrics.
+    collect() возвращает список (имя, тип, описание, значение).
+    """
+    _collectors.append(collect)
+
+
+def render():
+    """Все метрики процесса в текстовом формате Prometheus"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, type_, documentation, value in collect():
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {type_}",
+                      f"{name} {_format_value(value)}"]
+    return "\n".join(lines) + "\n"
+
+# ============= HTTP =============
+
+REQUESTS = Counter("http_requests_total", "Число HTTP-запросов", ("method", "route", "status"))
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Время обработки HTTP-запроса",
+                             ("method", "route"))
+IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP-запросы в обработке")
+REQUEST_DB_DURATION = Histogram("http_request_db_seconds", "Время SQL-запросов за один HTTP-запрос",
+                                ("method", "route"))
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "Число SQL-запросов за один HTTP-запрос",
+                               ("method", "route"), buckets=QUERY_COUNT_BUCKETS)
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Время одного SQL-запроса")
+
+
+class _RequestDbStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Контекст копируется в поток threadpool вместе со ссылкой на объект,
+# поэтому sync-обработчики дописывают статистику в тот же объект
+_request_db_stats = contextvars.ContextVar("request_db_stats", default=None)
+
+_query_listeners = []
+
+
+def add_query_listener(listener):
+    """
+    Вызывать listener(seconds, statement, parameters, connection) после каждого SQL-запроса.
+    connection - DBAPI-подключение, на котором можно выполнить EXPLAIN
+    (None для executemany и запросов, завершившихся ошибкой).
+    """
+    _query_listeners.append(listener)
+
+
+def record_query(seconds, statement=None, parameters=None, connection=None):
+    """Учесть выполненный SQL-запрос в метриках и в статистике текущего HTTP-запроса"""
+    DB_QUERY_DURATION.observe(seconds)
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += seconds
+    for listener in _query_listeners:
+        listener(seconds, statement, parameters, connection)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: метрики HTTP-запросов по шаблону маршрута"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = _RequestDbStats()
+        token = _request_db_stats.set(stats)
+        IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_PROGRESS.dec()
+            _request_db_stats.reset(token)
+            # Маршрут FastAPI кладёт в scope при сопоставлении; несовпавшие
+            # пути собираются в одну метку, чтобы не плодить ряды
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            REQUESTS.inc(method, route, str(status))
+            REQUEST_DURATION.observe(elapsed, method, route)
+            REQUEST_DB_DURATION.observe(stats.seconds, method, route)
+            REQUEST_DB_QUERIES.observe(stats.queries, method, route)
+
+# ============= SQLAlchemy =============
+
+def instrument_engine(engine):
+    """Замерять SQL-запросы движка SQLAlchemy (для AsyncEngine - engine.sync_engine)"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        dbapi_connection = None
+        if _query_listeners and not executemany:
+            dbapi_connection = conn.connection.dbapi_connection
+        record_query(elapsed, statement, None if executemany else parameters, dbapi_connection)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_started"):
+            record_query(time.perf_counter() - conn.info["metrics_started"].pop(),
+                         exception_context.statement)
+
+
+def sqlalchemy_pool_collector(engine):
+    """Состояние QueuePool движка SQLAlchemy"""
+    pool = engine.pool
+
+    def collect():
+        if not hasattr(pool, "checkedout"):
+            return []
+        return [
+            ("db_pool_size", "gauge", "Постоянных подключений в пуле", pool.size()),
+            ("db_pool_in_use", "gauge", "Выданных подключений", pool.checkedout()),
+            ("db_pool_idle", "gauge", "Свободных подключений", pool.checkedin()),
+            ("db_pool_overflow", "gauge", "Подключений сверх размера пула (отрицательное - ещё не открыты)",
+             pool.overflow()),
+        ]
+    return collect
+
+# ============= psycopg2 =============
+
+_timed_cursors = {}
+
+
+class _TimedCursorMixin:
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception:
+            record_query(time.perf_counter() - started, query)
+            raise
+        record_query(time.perf_counter() - started, query, vars, self.connection)
+        return result
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(time.perf_counter() - started, query)
+
+
+def timed_cursor(base):
+    """Подкласс курсора base, замеряющий execute/executemany"""
+    cls = _timed_cursors.get(base)
+    if cls is None:
+        cls = _timed_cursors[base] = type("Timed" + base.__name__, (_TimedCursorMixin, base), {})
+    return cls
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """
+    Подключение psycopg2, все курсоры которого замеряют запросы
+    (в том числе созданные с cursor_factory=RealDictCursor).
+    Передаётся в psycopg2.connect(..., connection_factory=TimedConnection).
+    """
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = timed_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+
+def connection_pool_collector(pool):
+    """Состояние пула db_pool.ConnectionPool"""
+    def collect():
+        stats = pool.stats()
+        return [
+            ("db_pool_size", "gauge", "Открытых подключений в пуле", stats["size"]),
+            ("db_pool_max_size", "gauge", "Максимальный размер пула", stats["max_size"]),
+            ("db_pool_in_use", "gauge", "Выданных подключений", stats["in_use"]),
+            ("db_pool_idle", "gauge", "Свободных подключений", stats["idle"]),
+            ("db_pool_waiting", "gauge", "Запросов в очереди за подключением", stats["waiting"]),
+            ("db_pool_checkouts_total", "counter", "Выдач подключений", stats["checkouts"]),
+            ("db_pool_timeouts_total", "counter", "Отказов по таймауту ожидания", stats["timeouts"]),
+            ("db_pool_rejected_total", "counter", "Отказов из-за переполненной очереди", stats["rejected"]),
+        ]
+    return collect
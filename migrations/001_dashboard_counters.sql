@@ -0,0 +1,171 @@
+-- ===================================================================
+-- Счётчики панели управления (/api/analytics/dashboard)
+-- Поддерживаются триггерами в той же транзакции, что и запись,
+-- поэтому панель читает несколько строк вместо агрегатов по таблицам.
+-- Схема: database_schema.sql (order_item, delivery, driver)
+-- ===================================================================
+
+-- Каждый счётчик разбит на 16 слотов: параллельные транзакции обновляют
+-- разные строки и не ждут друг друга. Значение = SUM(value) по слотам.
+CREATE TABLE IF NOT EXISTS dashboard_counter (
+    name VARCHAR(64) NOT NULL,
+    slot SMALLINT NOT NULL,
+    value NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, slot)
+);
+
+CREATE OR REPLACE FUNCTION dashboard_counter_add(counter_name TEXT, delta NUMERIC)
+RETURNS void AS $$
+BEGIN
+    IF delta = 0 THEN
+        RETURN;
+    END IF;
+    INSERT INTO dashboard_counter (name, slot, value)
+    VALUES (counter_name, pg_backend_pid() % 16, delta)
+    ON CONFLICT (name, slot) DO UPDATE SET value = dashboard_counter.value + EXCLUDED.value;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===== Заказы =====
+CREATE OR REPLACE FUNCTION dashboard_track_order_item()
+RETURNS trigger AS $$
+DECLARE
+    d_total INT := 0;
+    d_revenue NUMERIC := 0;
+    d_delivered INT := 0;
+    d_in_transit INT := 0;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        d_total := d_total - 1;
+        d_revenue := d_revenue - OLD.cost;
+        d_delivered := d_delivered - (OLD.status = 'Delivered')::INT;
+        d_in_transit := d_in_transit - (OLD.status = 'In Transit')::INT;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        d_total := d_total + 1;
+        d_revenue := d_revenue + NEW.cost;
+        d_delivered := d_delivered + (NEW.status = 'Delivered')::INT;
+        d_in_transit := d_in_transit + (NEW.status = 'In Transit')::INT;
+    END IF;
+    PERFORM dashboard_counter_add('orders_total', d_total);
+    PERFORM dashboard_counter_add('orders_revenue', d_revenue);
+    PERFORM dashboard_counter_add('orders_delivered', d_delivered);
+    PERFORM dashboard_counter_add('orders_in_transit', d_in_transit);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===== Доставки =====
+CREATE OR REPLACE FUNCTION dashboard_track_delivery()
+RETURNS trigger AS $$
+DECLARE
+    d_total INT := 0;
+    d_cost NUMERIC := 0;
+    d_delivered INT := 0;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        d_total := d_total - 1;
+        d_cost := d_cost - OLD.delivery_cost;
+        d_delivered := d_delivered - (OLD.status = 'Delivered')::INT;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        d_total := d_total + 1;
+        d_cost := d_cost + NEW.delivery_cost;
+        d_delivered := d_delivered + (NEW.status = 'Delivered')::INT;
+    END IF;
+    PERFORM dashboard_counter_add('deliveries_total', d_total);
+    PERFORM dashboard_counter_add('deliveries_cost_sum', d_cost);
+    PERFORM dashboard_counter_add('deliveries_delivered', d_delivered);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===== Водители =====
+CREATE OR REPLACE FUNCTION dashboard_track_driver()
+RETURNS trigger AS $$
+DECLARE
+    d_available INT := 0;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        d_available := d_available - COALESCE(OLD.is_available, FALSE)::INT;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        d_available := d_available + COALESCE(NEW.is_available, FALSE)::INT;
+    END IF;
+    PERFORM dashboard_counter_add('drivers_available', d_available);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===== Пересчёт с нуля (исправление расхождений, после TRUNCATE) =====
+CREATE OR REPLACE FUNCTION rebuild_dashboard_counters()
+RETURNS void AS $$
+BEGIN
+    -- Блокируем запись в исходные таблицы на время пересчёта,
+    -- чтобы счётчики соответствовали одному состоянию данных
+    LOCK TABLE order_item, delivery, driver IN SHARE MODE;
+    DELETE FROM dashboard_counter;
+
+    INSERT INTO dashboard_counter (name, slot, value)
+    SELECT v.name, 0, v.value
+    FROM (
+        SELECT
+            COUNT(*) AS total,
+            COALESCE(SUM(cost), 0) AS revenue,
+            COUNT(*) FILTER (WHERE status = 'Delivered') AS delivered,
+            COUNT(*) FILTER (WHERE status = 'In Transit') AS in_transit
+        FROM order_item
+    ) o,
+    LATERAL (VALUES
+        ('orders_total', o.total),
+        ('orders_revenue', o.revenue),
+        ('orders_delivered', o.delivered),
+        ('orders_in_transit', o.in_transit)
+    ) AS v(name, value);
+
+    INSERT INTO dashboard_counter (name, slot, value)
+    SELECT v.name, 0, v.value
+    FROM (
+        SELECT
+            COUNT(*) AS total,
+            COALESCE(SUM(delivery_cost), 0) AS cost_sum,
+            COUNT(*) FILTER (WHERE status = 'Delivered') AS delivered
+        FROM delivery
+    ) d,
+    LATERAL (VALUES
+        ('deliveries_total', d.total),
+        ('deliveries_cost_sum', d.cost_sum),
+        ('deliveries_delivered', d.delivered)
+    ) AS v(name, value);
+
+    INSERT INTO dashboard_counter (name, slot, value)
+    SELECT 'drivers_available', 0, COUNT(*) FROM driver WHERE is_available = TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры создаются только для схемы database_schema.sql
+DO $$
+BEGIN
+    IF to_regclass('order_item') IS NULL OR to_regclass('delivery') IS NULL OR to_regclass('driver') IS NULL THEN
+        RAISE NOTICE 'dashboard counters: tables order_item/delivery/driver not found, skipping triggers';
+        RETURN;
+    END IF;
+
+    DROP TRIGGER IF EXISTS trg_dashboard_order_item ON order_item;
+    CREATE TRIGGER trg_dashboard_order_item
+        AFTER INSERT OR DELETE OR UPDATE OF status, cost ON order_item
+        FOR EACH ROW EXECUTE FUNCTION dashboard_track_order_item();
+
+    DROP TRIGGER IF EXISTS trg_dashboard_delivery ON delivery;
+    CREATE TRIGGER trg_dashboard_delivery
+        AFTER INSERT OR DELETE OR UPDATE OF status, delivery_cost ON delivery
+        FOR EACH ROW EXECUTE FUNCTION dashboard_track_delivery();
+
+    DROP TRIGGER IF EXISTS trg_dashboard_driver ON driver;
+    CREATE TRIGGER trg_dashboard_driver
+        AFTER INSERT OR DELETE OR UPDATE OF is_available ON driver
+        FOR EACH ROW EXECUTE FUNCTION dashboard_track_driver();
+
+    PERFORM rebuild_dashboard_counters();
+END;
+$$;
@@ -0,0 +1,51 @@
+-- ===================================================================
+-- Версии таблиц для ETag (условные GET-запросы API)
+-- Каждая запись в таблицу (INSERT/UPDATE/DELETE/TRUNCATE) увеличивает
+-- её версию в той же транзакции, поэтому API сравнивает If-None-Match
+-- с версией, не выполняя запрос страницы.
+-- Схемы: database_schema.sql и database_schema_updated.sql
+-- ===================================================================
+
+-- Как и у счётчиков панели, версия разбита на 16 слотов, чтобы параллельные
+-- транзакции не ждали друг друга на одной строке. Версия = SUM(version).
+CREATE TABLE IF NOT EXISTS table_version (
+    table_name VARCHAR(64) NOT NULL,
+    slot SMALLINT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, slot)
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version()
+RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_version (table_name, slot, version)
+    VALUES (TG_TABLE_NAME, pg_backend_pid() % 16, 1)
+    ON CONFLICT (table_name, slot) DO UPDATE SET version = table_version.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры создаются для тех таблиц, которые есть в текущей схеме
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY[
+        -- database_schema.sql
+        'employee', 'customer', 'driver', 'vehicle', 'warehouse', 'route', 'order_item', 'delivery',
+        -- database_schema_updated.sql
+        'employees', 'customers', 'drivers', 'vehicles', 'warehouses', 'delivery_routes',
+        'orders', 'shipments', 'deliveries'
+    ] LOOP
+        IF to_regclass(tbl) IS NULL THEN
+            CONTINUE;
+        END IF;
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_table_version ON %I', tbl);
+        EXECUTE format(
+            'CREATE TRIGGER trg_table_version
+                 AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+                 FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', tbl);
+        RAISE NOTICE 'table version: trigger created on %', tbl;
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,150 @@
+-- ===================================================================
+-- Показатели водителей (/api/analytics/driver-performance)
+-- Поддерживаются триггерами на доставках (database_schema.sql: delivery)
+-- и отправках (database_schema_updated.sql: shipments), поэтому отчёт
+-- читает строки по водителям, а не группирует всю историю доставок.
+-- ===================================================================
+
+-- Как и счётчики панели, строки водителя разбиты на 16 слотов, чтобы
+-- параллельные назначения одному водителю не ждали друг друга.
+-- Значение показателя = SUM по слотам.
+CREATE TABLE IF NOT EXISTS driver_performance (
+    driver_id INT NOT NULL,
+    slot SMALLINT NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    delivered INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    in_progress INT NOT NULL DEFAULT 0,
+    cost_sum NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (driver_id, slot)
+);
+
+-- Группа статуса для обеих схем (английские и русские статусы)
+CREATE OR REPLACE FUNCTION driver_performance_state(status TEXT)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN status IN ('Delivered', 'Доставлено') THEN 'delivered'
+        WHEN status IN ('Failed', 'Отменено', 'Не доставлено') THEN 'failed'
+        WHEN status IN ('In Transit', 'В пути') THEN 'in_progress'
+        ELSE 'pending'
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- sign = 1 для новой версии строки, -1 для старой
+CREATE OR REPLACE FUNCTION driver_performance_add(p_driver_id INT, p_status TEXT, p_cost NUMERIC, sign INT)
+RETURNS void AS $$
+DECLARE
+    state TEXT := driver_performance_state(p_status);
+BEGIN
+    IF p_driver_id IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO driver_performance AS p (driver_id, slot, total, delivered, failed, in_progress, cost_sum)
+    VALUES (
+        p_driver_id, pg_backend_pid() % 16, sign,
+        sign * (state = 'delivered')::INT,
+        sign * (state = 'failed')::INT,
+        sign * (state = 'in_progress')::INT,
+        sign * COALESCE(p_cost, 0)
+    )
+    ON CONFLICT (driver_id, slot) DO UPDATE SET
+        total = p.total + EXCLUDED.total,
+        delivered = p.delivered + EXCLUDED.delivered,
+        failed = p.failed + EXCLUDED.failed,
+        in_progress = p.in_progress + EXCLUDED.in_progress,
+        cost_sum = p.cost_sum + EXCLUDED.cost_sum;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===== database_schema.sql: delivery =====
+CREATE OR REPLACE FUNCTION driver_performance_track_delivery()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM driver_performance_add(OLD.driver_id, OLD.status, OLD.delivery_cost, -1);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM driver_performance_add(NEW.driver_id, NEW.status, NEW.delivery_cost, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===== database_schema_updated.sql: shipments =====
+CREATE OR REPLACE FUNCTION driver_performance_track_shipment()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM driver_performance_add(OLD.driver_id, OLD.status, OLD.cost, -1);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM driver_performance_add(NEW.driver_id, NEW.status, NEW.cost, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Таблица-источник: delivery с driver_id (database_schema.sql) или shipments
+-- (database_schema_updated.sql); в database_schema_simplified.sql у delivery нет driver_id
+CREATE OR REPLACE FUNCTION driver_performance_source()
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN EXISTS (SELECT 1 FROM information_schema.columns
+                     WHERE table_schema = current_schema() AND table_name = 'delivery'
+                       AND column_name = 'driver_id') THEN 'delivery'
+        WHEN to_regclass('shipments') IS NOT NULL THEN 'shipments'
+    END;
+$$ LANGUAGE sql STABLE;
+
+-- ===== Пересчёт с нуля (исправление расхождений, после TRUNCATE) =====
+CREATE OR REPLACE FUNCTION rebuild_driver_performance()
+RETURNS void AS $$
+BEGIN
+    IF driver_performance_source() = 'delivery' THEN
+        LOCK TABLE delivery IN SHARE MODE;
+        DELETE FROM driver_performance;
+        INSERT INTO driver_performance (driver_id, slot, total, delivered, failed, in_progress, cost_sum)
+        SELECT
+            driver_id, 0, COUNT(*),
+            COUNT(*) FILTER (WHERE driver_performance_state(status) = 'delivered'),
+            COUNT(*) FILTER (WHERE driver_performance_state(status) = 'failed'),
+            COUNT(*) FILTER (WHERE driver_performance_state(status) = 'in_progress'),
+            COALESCE(SUM(delivery_cost), 0)
+        FROM delivery
+        GROUP BY driver_id;
+    ELSIF driver_performance_source() = 'shipments' THEN
+        LOCK TABLE shipments IN SHARE MODE;
+        DELETE FROM driver_performance;
+        INSERT INTO driver_performance (driver_id, slot, total, delivered, failed, in_progress, cost_sum)
+        SELECT
+            driver_id, 0, COUNT(*),
+            COUNT(*) FILTER (WHERE driver_performance_state(status) = 'delivered'),
+            COUNT(*) FILTER (WHERE driver_performance_state(status) = 'failed'),
+            COUNT(*) FILTER (WHERE driver_performance_state(status) = 'in_progress'),
+            COALESCE(SUM(cost), 0)
+        FROM shipments
+        GROUP BY driver_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF driver_performance_source() = 'delivery' THEN
+        DROP TRIGGER IF EXISTS trg_driver_performance ON delivery;
+        CREATE TRIGGER trg_driver_performance
+            AFTER INSERT OR DELETE OR UPDATE OF driver_id, status, delivery_cost ON delivery
+            FOR EACH ROW EXECUTE FUNCTION driver_performance_track_delivery();
+    ELSIF driver_performance_source() = 'shipments' THEN
+        DROP TRIGGER IF EXISTS trg_driver_performance ON shipments;
+        CREATE TRIGGER trg_driver_performance
+            AFTER INSERT OR DELETE OR UPDATE OF driver_id, status, cost ON shipments
+            FOR EACH ROW EXECUTE FUNCTION driver_performance_track_shipment();
+    ELSE
+        RAISE NOTICE 'driver performance: tables delivery/shipments not found, skipping triggers';
+        RETURN;
+    END IF;
+
+    PERFORM rebuild_driver_performance();
+END;
+$$;
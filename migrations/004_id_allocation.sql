@@ -0,0 +1,40 @@
+-- ===================================================================
+-- Выдача идентификаторов из последовательностей и ключи идемпотентности
+-- Схема: database_schema_updated.sql (fastapi_backend_raw_sql.py)
+-- ===================================================================
+
+-- Раньше заказы и отправки вставлялись с явным id = MAX(id) + 1, и
+-- последовательности SERIAL-колонок могли отстать от данных. Теперь id
+-- берутся из последовательностей, поэтому подтягиваем их к MAX(id).
+DO $$
+DECLARE
+    tbl TEXT;
+    col TEXT;
+    seq TEXT;
+    max_id BIGINT;
+BEGIN
+    FOR tbl, col IN VALUES ('orders', 'order_id'), ('shipments', 'shipment_id'), ('deliveries', 'delivery_id') LOOP
+        IF to_regclass(tbl) IS NULL THEN
+            CONTINUE;
+        END IF;
+        seq := pg_get_serial_sequence(tbl, col);
+        EXECUTE format('SELECT MAX(%I) FROM %I', col, tbl) INTO max_id;
+        IF seq IS NOT NULL AND max_id IS NOT NULL THEN
+            EXECUTE format('SELECT setval(%L, GREATEST(%s, last_value)) FROM %s', seq, max_id, seq);
+            RAISE NOTICE 'id allocation: % synced to %', seq, max_id;
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- Ответы на запросы с заголовком Idempotency-Key
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(64) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    response JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (scope, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at);
@@ -0,0 +1,496 @@
+-- ===================================================================
+-- Помесячное секционирование заказов и доставок
+-- database_schema.sql: order_item (order_date), delivery (created_at)
+-- database_schema_updated.sql: orders (order_date), deliveries (created_at)
+-- Запросы с условием на ключ секционирования читают только нужные месяцы,
+-- старые месяцы отсоединяются целиком (partition_manager.py detach).
+-- ===================================================================
+
+-- Имя месячной секции: order_item_p202401
+CREATE OR REPLACE FUNCTION partition_name(parent TEXT, month DATE)
+RETURNS TEXT AS $$
+    SELECT parent || '_p' || to_char(month, 'YYYYMM');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Колонка ключа секционирования таблицы (NULL, если таблица не секционирована)
+CREATE OR REPLACE FUNCTION partition_key(parent TEXT)
+RETURNS TEXT AS $$
+    SELECT a.attname::TEXT
+    FROM pg_partitioned_table pt
+    JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+    WHERE pt.partrelid = to_regclass(parent);
+$$ LANGUAGE sql STABLE;
+
+-- Создать секцию месяца month. Строки этого месяца, попавшие в секцию
+-- по умолчанию, переносятся в новую секцию. Перенос идёт мимо триггеров:
+-- секция по умолчанию на это время отсоединяется, новая таблица ещё не
+-- присоединена, поэтому счётчики и версии таблиц не меняются.
+CREATE OR REPLACE FUNCTION partition_create(parent TEXT, month DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    lower_bound DATE := date_trunc('month', month)::DATE;
+    upper_bound DATE := (date_trunc('month', month) + INTERVAL '1 month')::DATE;
+    part TEXT := partition_name(parent, lower_bound);
+    default_part TEXT := parent || '_default';
+    key_column TEXT := partition_key(parent);
+    misplaced BOOLEAN := FALSE;
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+    IF to_regclass(default_part) IS NOT NULL THEN
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= %L AND %I < %L)',
+                       default_part, key_column, lower_bound, key_column, upper_bound)
+        INTO misplaced;
+    END IF;
+
+    IF NOT misplaced THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                       part, parent, lower_bound, upper_bound);
+        RETURN TRUE;
+    END IF;
+
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, default_part);
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part, parent);
+    EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                   'INSERT INTO %I SELECT * FROM moved',
+                   default_part, key_column, lower_bound, key_column, upper_bound, part);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   parent, part, lower_bound, upper_bound);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', parent, default_part);
+    RAISE NOTICE 'partitioning: rows of % moved from % to %', lower_bound, default_part, part;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Секции с текущего месяца на months_ahead месяцев вперёд; возвращает число созданных
+CREATE OR REPLACE FUNCTION partition_ensure(parent TEXT, months_ahead INT DEFAULT 3)
+RETURNS INT AS $$
+DECLARE
+    created INT := 0;
+    month DATE;
+BEGIN
+    FOR month IN
+        SELECT generate_series(date_trunc('month', CURRENT_DATE),
+                               date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead),
+                               INTERVAL '1 month')::DATE
+    LOOP
+        IF partition_create(parent, month) THEN
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Отсоединить секции месяцев раньше before_month; они остаются отдельными таблицами
+-- для архивации (pg_dump -t) и удаления. Версия таблицы для ETag увеличивается.
+CREATE OR REPLACE FUNCTION partition_detach(parent TEXT, before_month DATE)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname::TEXT AS name
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(parent)
+          AND c.relname::TEXT ~ ('^' || parent || '_p[0-9]{6}$')
+          AND to_date(right(c.relname::TEXT, 6), 'YYYYMM') + INTERVAL '1 month' <= before_month
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, part.name);
+        RETURN NEXT part.name;
+    END LOOP;
+
+    IF FOUND AND to_regclass('table_version') IS NOT NULL THEN
+        INSERT INTO table_version (table_name, slot, version)
+        VALUES (parent, pg_backend_pid() % 16, 1)
+        ON CONFLICT (table_name, slot) DO UPDATE SET version = table_version.version + 1;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Внешний ключ на секционированную таблицу требует ключ секционирования
+-- в ссылке, поэтому ссылки на заказы проверяются триггерами.
+-- TG_ARGV: таблица заказов, её колонка, колонка ссылающейся таблицы
+CREATE OR REPLACE FUNCTION partition_fk_check()
+RETURNS trigger AS $$
+DECLARE
+    matches INT;
+BEGIN
+    EXECUTE format('SELECT count(*) FROM (SELECT 1 FROM %I WHERE %I = ($1).%I FOR KEY SHARE) s',
+                   TG_ARGV[0], TG_ARGV[1], TG_ARGV[2])
+    USING NEW INTO matches;
+    IF matches = 0 AND (to_jsonb(NEW) ->> TG_ARGV[2]) IS NOT NULL THEN
+        RAISE EXCEPTION 'insert or update on table "%" violates foreign key to "%"', TG_TABLE_NAME, TG_ARGV[0]
+            USING ERRCODE = 'foreign_key_violation',
+                  DETAIL = format('Key (%s)=(%s) is not present in table "%s".',
+                                  TG_ARGV[2], to_jsonb(NEW) ->> TG_ARGV[2], TG_ARGV[0]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Удаление заказа, на который ссылаются. Перенос строки в другую секцию
+-- (смена даты) выглядит как DELETE, поэтому сначала проверяется, что ключа нет.
+-- TG_ARGV: ссылающаяся таблица, её колонка, колонка заказов, таблица заказов
+-- (TG_TABLE_NAME в триггере секции - имя секции)
+CREATE OR REPLACE FUNCTION partition_fk_restrict()
+RETURNS trigger AS $$
+DECLARE
+    still_exists BOOLEAN;
+    referenced BOOLEAN;
+BEGIN
+    IF TG_OP = 'UPDATE' AND (to_jsonb(NEW) -> TG_ARGV[2]) = (to_jsonb(OLD) -> TG_ARGV[2]) THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I = ($1).%I)', TG_ARGV[3], TG_ARGV[2], TG_ARGV[2])
+    USING OLD INTO still_exists;
+    IF still_exists THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I = ($1).%I)', TG_ARGV[0], TG_ARGV[1], TG_ARGV[2])
+    USING OLD INTO referenced;
+    IF referenced THEN
+        RAISE EXCEPTION 'update or delete on table "%" violates foreign key from "%"', TG_ARGV[3], TG_ARGV[0]
+            USING ERRCODE = 'foreign_key_violation',
+                  DETAIL = format('Key (%s)=(%s) is still referenced from table "%s".',
+                                  TG_ARGV[2], to_jsonb(OLD) ->> TG_ARGV[2], TG_ARGV[0]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Уникальный индекс секционированной таблицы обязан включать ключ
+-- секционирования, поэтому уникальность без него (order_id, order_number)
+-- держит отдельная несекционированная таблица ключей с первичным ключом.
+-- Триггер добавляет ключ при вставке и убирает при удалении, если строк
+-- с ним не осталось. Ключ, который уже есть в таблице ключей, допустим,
+-- только если строка с ним одна: так переживаются перенос строки в другую
+-- секцию (DELETE + INSERT) и ключи строк, ушедших мимо триггера (отсоединённые
+-- секции). Строка ключа при этом блокируется UPDATE, чтобы две транзакции
+-- с одним ключом не прошли проверку одновременно.
+-- TG_ARGV: таблица, таблица ключей, колонки ключа
+CREATE OR REPLACE FUNCTION partition_unique_check()
+RETURNS trigger AS $$
+DECLARE
+    tbl TEXT := TG_ARGV[0];
+    key_table TEXT := TG_ARGV[1];
+    column_list TEXT;
+    key_values TEXT;
+    key_match TEXT;
+    first_column TEXT := quote_ident(TG_ARGV[2]);
+    unchanged BOOLEAN;
+    inserted INT;
+    matches INT;
+BEGIN
+    SELECT string_agg(quote_ident(c), ', ' ORDER BY n), string_agg(format('($1).%I', c), ', ' ORDER BY n)
+    INTO column_list, key_values
+    FROM unnest(TG_ARGV[2:TG_NARGS - 1]) WITH ORDINALITY AS k(c, n);
+    key_match := format('(%s) = (%s)', column_list, key_values);
+
+    IF TG_OP = 'UPDATE' THEN
+        EXECUTE format('SELECT ROW(%s) IS NOT DISTINCT FROM ROW(%s)', key_values, replace(key_values, '$1', '$2'))
+        USING OLD, NEW INTO unchanged;
+        IF unchanged THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format('DELETE FROM %I WHERE %s AND NOT EXISTS (SELECT 1 FROM %I WHERE %s)',
+                       key_table, key_match, tbl, key_match)
+        USING OLD;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        EXECUTE format('INSERT INTO %I (%s) SELECT %s WHERE ROW(%s) IS NOT NULL ON CONFLICT DO NOTHING',
+                       key_table, column_list, key_values, key_values)
+        USING NEW;
+        GET DIAGNOSTICS inserted = ROW_COUNT;
+        IF inserted = 0 THEN
+            EXECUTE format('UPDATE %I SET %s = %s WHERE %s', key_table, first_column, first_column, key_match)
+            USING NEW;
+            EXECUTE format('SELECT count(*) FROM (SELECT 1 FROM %I WHERE %s LIMIT 2) s', tbl, key_match)
+            USING NEW INTO matches;
+            IF matches > 1 THEN
+                RAISE EXCEPTION 'duplicate key value violates unique constraint "%"', key_table
+                    USING ERRCODE = 'unique_violation',
+                          DETAIL = format('Key (%s)=(%s) already exists in table "%s".',
+                                          array_to_string(TG_ARGV[2:TG_NARGS - 1], ', '),
+                                          (SELECT string_agg(to_jsonb(NEW) ->> c, ', ')
+                                           FROM unnest(TG_ARGV[2:TG_NARGS - 1]) AS c),
+                                          tbl);
+            END IF;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Таблица ключей key_table для уникальности columns по всем секциям tbl
+-- (заполняется текущими строками) и триггер, который её поддерживает
+CREATE OR REPLACE FUNCTION partition_unique_create(tbl TEXT, key_table TEXT, columns TEXT[])
+RETURNS void AS $$
+DECLARE
+    column_list TEXT := (SELECT string_agg(quote_ident(c), ', ' ORDER BY n)
+                         FROM unnest(columns) WITH ORDINALITY AS k(c, n));
+    column_args TEXT := (SELECT string_agg(quote_literal(c), ', ' ORDER BY n)
+                         FROM unnest(columns) WITH ORDINALITY AS k(c, n));
+BEGIN
+    EXECUTE format('CREATE TABLE %I AS SELECT %s FROM %I WITH NO DATA', key_table, column_list, tbl);
+    EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (%s)', key_table, column_list);
+    EXECUTE format('INSERT INTO %I SELECT %s FROM %I WHERE ROW(%s) IS NOT NULL',
+                   key_table, column_list, tbl, column_list);
+    EXECUTE format('CREATE TRIGGER %I AFTER INSERT OR DELETE OR UPDATE OF %s ON %I '
+                   'FOR EACH ROW EXECUTE FUNCTION partition_unique_check(%L, %L, %s)',
+                   key_table, column_list, tbl, tbl, key_table, column_args);
+    RAISE NOTICE 'partitioning: (%) of % is unique across partitions via table %', column_list, tbl, key_table;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===== Преобразование обычной таблицы в секционированную =====
+-- Таблица пересоздаётся с тем же именем и данными: первичный ключ и уникальные
+-- индексы дополняются ключом секционирования (прежняя уникальность по всей
+-- таблице держится таблицами ключей <индекс>_global, см. partition_unique_check;
+-- для индексов по выражениям и частичных она теряется с NOTICE), индексы, внешние ключи, триггеры
+-- (счётчики, версии, показатели водителей) и зависимые представления
+-- создаются заново, владение последовательностью SERIAL переносится.
+-- Таблица блокируется на время копирования.
+CREATE OR REPLACE FUNCTION partition_convert(tbl TEXT, key_column TEXT, months_ahead INT DEFAULT 3)
+RETURNS void AS $$
+DECLARE
+    old_name TEXT := tbl || '_unpartitioned';
+    pk_columns TEXT;
+    pk_names TEXT[];
+    pk_name TEXT;
+    first_month DATE;
+    last_month DATE;
+    month DATE;
+    r RECORD;
+    sequences TEXT[] := '{}';
+    statements TEXT[] := '{}';
+    views TEXT[] := '{}';
+    incoming TEXT[] := '{}';
+    uniques TEXT[] := '{}';
+    stmt TEXT;
+BEGIN
+    IF to_regclass(tbl) IS NULL THEN
+        RAISE NOTICE 'partitioning: table % not found, skipping', tbl;
+        RETURN;
+    END IF;
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass(tbl)) = 'p' THEN
+        RAISE NOTICE 'partitioning: % is already partitioned', tbl;
+        RETURN;
+    END IF;
+
+    EXECUTE format('LOCK TABLE %I IN ACCESS EXCLUSIVE MODE', tbl);
+
+    SELECT string_agg(quote_ident(a.attname), ', ' ORDER BY k.ord),
+           array_agg(a.attname::TEXT ORDER BY k.ord), min(ic.relname::TEXT)
+    INTO pk_columns, pk_names, pk_name
+    FROM pg_index i
+    JOIN pg_class ic ON ic.oid = i.indexrelid
+    CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+    WHERE i.indrelid = to_regclass(tbl) AND i.indisprimary;
+
+    -- Индексы, кроме первичного ключа; в уникальные добавляется ключ секционирования
+    FOR r IN
+        SELECT pg_get_indexdef(i.indexrelid) AS def, i.indisunique AS is_unique,
+               ic.relname::TEXT AS name, 0 = ANY (i.indkey) AS has_expressions,
+               ARRAY(SELECT a.attname::TEXT
+                     FROM unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+                     JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                     ORDER BY k.ord) AS columns,
+               key_column = ANY (SELECT a.attname::TEXT FROM pg_attribute a
+                          WHERE a.attrelid = i.indrelid AND a.attnum = ANY (i.indkey)) AS has_key
+        FROM pg_index i
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(tbl) AND NOT i.indisprimary
+        ORDER BY i.indexrelid
+    LOOP
+        IF r.is_unique AND NOT r.has_key THEN
+            IF r.def ~ '\)$' AND r.def !~ ' (WHERE|INCLUDE) ' THEN
+                statements := statements || regexp_replace(r.def, '\)$', ', ' || quote_ident(key_column) || ')');
+                IF r.has_expressions THEN
+                    RAISE NOTICE 'partitioning: % is unique only within a month partition: %', r.name, r.def;
+                ELSE
+                    uniques := uniques || format('SELECT partition_unique_create(%L, %L, %L)',
+                                                 tbl, r.name || '_global', r.columns);
+                END IF;
+            ELSE
+                RAISE NOTICE 'partitioning: unique index skipped: %', r.def;
+            END IF;
+        ELSE
+            statements := statements || r.def;
+        END IF;
+    END LOOP;
+
+    -- Внешние ключи этой таблицы
+    FOR r IN
+        SELECT conname, pg_get_constraintdef(oid) AS def
+        FROM pg_constraint
+        WHERE conrelid = to_regclass(tbl) AND contype = 'f'
+        ORDER BY oid
+    LOOP
+        statements := statements || format('ALTER TABLE %I ADD CONSTRAINT %I %s', tbl, r.conname, r.def);
+    END LOOP;
+
+    -- Пользовательские триггеры; определение ссылается на таблицу по имени
+    FOR r IN
+        SELECT pg_get_triggerdef(oid) AS def
+        FROM pg_trigger
+        WHERE tgrelid = to_regclass(tbl) AND NOT tgisinternal
+        ORDER BY oid
+    LOOP
+        statements := statements || r.def;
+    END LOOP;
+
+    -- Внешние ключи на эту таблицу (одноколоночные) заменяются триггерами
+    FOR r IN
+        SELECT c.conrelid::regclass::TEXT AS child, c.conname,
+               ca.attname::TEXT AS child_column, pa.attname::TEXT AS parent_column
+        FROM pg_constraint c
+        JOIN pg_attribute ca ON ca.attrelid = c.conrelid AND ca.attnum = c.conkey[1]
+        JOIN pg_attribute pa ON pa.attrelid = c.confrelid AND pa.attnum = c.confkey[1]
+        WHERE c.confrelid = to_regclass(tbl) AND c.contype = 'f' AND cardinality(c.conkey) = 1
+    LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', r.child, r.conname);
+        incoming := incoming
+            || format('CREATE TRIGGER %I AFTER INSERT OR UPDATE OF %I ON %s '
+                      'FOR EACH ROW EXECUTE FUNCTION partition_fk_check(%L, %L, %L)',
+                      r.conname, r.child_column, r.child, tbl, r.parent_column, r.child_column)
+            || format('CREATE TRIGGER %I AFTER DELETE OR UPDATE OF %I ON %I '
+                      'FOR EACH ROW EXECUTE FUNCTION partition_fk_restrict(%L, %L, %L, %L)',
+                      r.conname || '_restrict', r.parent_column, tbl,
+                      r.child, r.child_column, r.parent_column, tbl);
+    END LOOP;
+
+    -- Зависимые представления (и представления над ними) в порядке создания
+    FOR r IN
+        WITH RECURSIVE deps(oid) AS (
+            SELECT rw.ev_class
+            FROM pg_depend d JOIN pg_rewrite rw ON rw.oid = d.objid
+            WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = to_regclass(tbl)
+              AND rw.ev_class <> to_regclass(tbl)
+            UNION
+            SELECT rw.ev_class
+            FROM deps
+            JOIN pg_depend d ON d.refobjid = deps.oid AND d.classid = 'pg_rewrite'::regclass
+            JOIN pg_rewrite rw ON rw.oid = d.objid
+            WHERE rw.ev_class <> deps.oid
+        )
+        SELECT c.oid::regclass::TEXT AS name, c.relkind, pg_get_viewdef(c.oid) AS def
+        FROM deps JOIN pg_class c ON c.oid = deps.oid
+        ORDER BY c.oid
+    LOOP
+        views := views || format('CREATE %sVIEW %s AS %s',
+                                 CASE WHEN r.relkind = 'm' THEN 'MATERIALIZED ' ELSE '' END,
+                                 r.name, rtrim(r.def, ';'));
+    END LOOP;
+
+    -- Последовательности SERIAL-колонок не должны удалиться вместе со старой таблицей
+    FOR r IN
+        SELECT s.oid::regclass::TEXT AS seq, a.attname::TEXT AS col
+        FROM pg_depend d
+        JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+        JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+        WHERE d.refobjid = to_regclass(tbl) AND d.deptype = 'a'
+    LOOP
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY NONE', r.seq);
+        sequences := sequences || format('ALTER SEQUENCE %s OWNED BY %I.%I', r.seq, tbl, r.col);
+    END LOOP;
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', tbl, old_name);
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE '
+                   'INCLUDING COMMENTS) PARTITION BY RANGE (%I)', tbl, old_name, key_column);
+
+    EXECUTE format('SELECT MIN(%I)::DATE, MAX(%I)::DATE FROM %I', key_column, key_column, old_name)
+    INTO first_month, last_month;
+    FOR month IN
+        SELECT generate_series(date_trunc('month', LEAST(first_month, CURRENT_DATE)),
+                               date_trunc('month', GREATEST(last_month, CURRENT_DATE + make_interval(months => months_ahead))),
+                               INTERVAL '1 month')::DATE
+    LOOP
+        PERFORM partition_create(tbl, month);
+    END LOOP;
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', tbl || '_default', tbl);
+
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', tbl, old_name);
+    EXECUTE format('DROP TABLE %I CASCADE', old_name);
+
+    IF pk_columns IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (%s)', tbl,
+                       CASE WHEN key_column = ANY (pk_names) THEN pk_columns
+                            ELSE pk_columns || ', ' || quote_ident(key_column) END);
+        IF NOT key_column = ANY (pk_names) THEN
+            uniques := ARRAY[format('SELECT partition_unique_create(%L, %L, %L)',
+                                    tbl, pk_name || '_global', pk_names)] || uniques;
+        END IF;
+    END IF;
+    FOREACH stmt IN ARRAY sequences || statements || uniques || views || incoming LOOP
+        EXECUTE stmt;
+    END LOOP;
+    EXECUTE format('ANALYZE %I', tbl);
+    RAISE NOTICE 'partitioning: % partitioned by month on %', tbl, key_column;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===== database_schema.sql: у delivery нет даты создания =====
+-- Добавляется created_at: для существующих строк - время отправления
+-- или дата заказа, для новых - время вставки.
+DO $$
+BEGIN
+    IF to_regclass('delivery') IS NULL OR to_regclass('order_item') IS NULL
+       OR NOT EXISTS (SELECT 1 FROM information_schema.columns
+                      WHERE table_schema = current_schema() AND table_name = 'delivery'
+                        AND column_name = 'departure_time')
+       OR EXISTS (SELECT 1 FROM information_schema.columns
+                  WHERE table_schema = current_schema() AND table_name = 'delivery'
+                    AND column_name = 'created_at') THEN
+        RETURN;
+    END IF;
+    ALTER TABLE delivery ADD COLUMN created_at TIMESTAMP;
+    UPDATE delivery d
+    SET created_at = COALESCE(d.departure_time, o.order_date::TIMESTAMP)
+    FROM order_item o
+    WHERE o.order_id = d.order_id;
+    UPDATE delivery SET created_at = COALESCE(departure_time, delivery_time, CURRENT_TIMESTAMP)
+    WHERE created_at IS NULL;
+    ALTER TABLE delivery
+        ALTER COLUMN created_at SET DEFAULT CURRENT_TIMESTAMP,
+        ALTER COLUMN created_at SET NOT NULL;
+END;
+$$;
+
+-- ===== database_schema_updated.sql: created_at допускал NULL =====
+DO $$
+BEGIN
+    IF to_regclass('deliveries') IS NOT NULL
+       AND (SELECT relkind FROM pg_class WHERE oid = to_regclass('deliveries')) = 'r' THEN
+        UPDATE deliveries SET created_at = COALESCE(updated_at, delivery_time, CURRENT_TIMESTAMP)
+        WHERE created_at IS NULL;
+    END IF;
+END;
+$$;
+
+-- Заказы раньше доставок: ссылки доставок на заказы заменяются триггерами
+-- при преобразовании заказов
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'order_item'
+                 AND column_name = 'order_date') THEN
+        PERFORM partition_convert('order_item', 'order_date');
+    END IF;
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'delivery'
+                 AND column_name = 'created_at') THEN
+        PERFORM partition_convert('delivery', 'created_at');
+    END IF;
+    PERFORM partition_convert('orders', 'order_date');
+    PERFORM partition_convert('deliveries', 'created_at');
+END;
+$$;
@@ -0,0 +1,80 @@
+-- ===================================================================
+-- События смены статуса (GET /api/events, WebSocket /api/ws/events)
+-- Триггер на orders, shipments и deliveries при изменении status
+-- отправляет NOTIFY в канал status_events. Уведомление доставляется
+-- только после фиксации транзакции, поэтому слушатели не видят
+-- откаченных изменений. Склад и водитель добавляются в событие,
+-- чтобы API мог фильтровать подписчиков без запросов к БД.
+-- Сущность передаётся аргументом триггера: orders и deliveries
+-- секционированы (005_partitioning.sql), и TG_TABLE_NAME у них -
+-- имя секции (orders_p202401), а не таблицы.
+-- Схема: database_schema_updated.sql
+-- ===================================================================
+
+CREATE OR REPLACE FUNCTION notify_status_change()
+RETURNS trigger AS $$
+DECLARE
+    entity TEXT := TG_ARGV[0];
+    entity_id INT;
+    v_order_id INT;
+    v_shipment_id INT;
+    v_warehouse_id INT;
+    v_driver_id INT;
+BEGIN
+    IF entity = 'orders' THEN
+        entity_id := NEW.order_id;
+        v_order_id := NEW.order_id;
+        v_warehouse_id := NEW.warehouse_id;
+    ELSIF entity = 'shipments' THEN
+        entity_id := NEW.shipment_id;
+        v_order_id := NEW.order_id;
+        v_shipment_id := NEW.shipment_id;
+        v_driver_id := NEW.driver_id;
+        SELECT o.warehouse_id INTO v_warehouse_id FROM orders o WHERE o.order_id = NEW.order_id;
+    ELSIF entity = 'deliveries' THEN
+        entity_id := NEW.delivery_id;
+        v_shipment_id := NEW.shipment_id;
+        SELECT s.order_id, s.driver_id, o.warehouse_id
+        INTO v_order_id, v_driver_id, v_warehouse_id
+        FROM shipments s
+        LEFT JOIN orders o ON o.order_id = s.order_id
+        WHERE s.shipment_id = NEW.shipment_id;
+    ELSE
+        RAISE WARNING 'notify_status_change: неизвестная сущность %', entity;
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('status_events', json_build_object(
+        'entity', entity,
+        'id', entity_id,
+        'status', NEW.status,
+        'previous_status', OLD.status,
+        'order_id', v_order_id,
+        'shipment_id', v_shipment_id,
+        'warehouse_id', v_warehouse_id,
+        'driver_id', v_driver_id,
+        'changed_at', to_char(clock_timestamp(), 'YYYY-MM-DD"T"HH24:MI:SS.MSOF')
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['orders', 'shipments', 'deliveries'] LOOP
+        IF to_regclass(tbl) IS NULL THEN
+            CONTINUE;
+        END IF;
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_status_event ON %I', tbl);
+        EXECUTE format(
+            'CREATE TRIGGER trg_status_event
+                 AFTER UPDATE OF status ON %I
+                 FOR EACH ROW
+                 WHEN (OLD.status IS DISTINCT FROM NEW.status)
+                 EXECUTE FUNCTION notify_status_change(%L)', tbl, tbl);
+        RAISE NOTICE 'status events: trigger created on %', tbl;
+    END LOOP;
+END;
+$$;
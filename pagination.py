@@ -0,0 +1,62 @@
+"""
+Курсорная (keyset) пагинация списков.
+
+Курсор - непрозрачная строка (base64url от JSON), в которой хранится имя
+сортировки и значения ключа последней строки страницы. Следующая страница
+выбирается условием по ключу (WHERE (order_date, order_id) < (...)) вместо
+OFFSET, поэтому её стоимость не зависит от глубины.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+
+class InvalidCursorError(ValueError):
+    """Курсор повреждён или не подходит к текущей сортировке"""
+
+
+def encode_cursor(sort, values):
+    """Упаковать ключ последней строки в курсор"""
+    payload = [sort, [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, sort, types):
+    """Распаковать курсор в кортеж значений ключа заданных типов"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor_sort, values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursorError("Некорректный курсор")
+    if cursor_sort != sort:
+        raise InvalidCursorError(f"Курсор выдан для сортировки '{cursor_sort}', а запрошена '{sort}'")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise InvalidCursorError("Некорректный курсор")
+    return tuple(_parse_value(t, v) for t, v in zip(types, values))
+
+
+def split_page(rows, limit, sort, key):
+    """
+    Отрезать лишнюю строку, запрошенную через LIMIT limit + 1,
+    и вернуть (строки страницы, курсор следующей страницы или None)
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(sort, key(rows[-1]))
+
+
+def _parse_value(type_, value):
+    try:
+        if type_ is int and isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if type_ is date and isinstance(value, str):
+            return date.fromisoformat(value)
+        if type_ is datetime and isinstance(value, str):
+            return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    raise InvalidCursorError("Некорректный курсор")
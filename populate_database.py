@@ -1,6 +1,14 @@
 import psycopg2
 from datetime import datetime, date, timedelta
+import argparse
+import csv
+import io
+import itertools
+import math
+import multiprocessing
+import os
 import random
+import time
 from decimal import Decimal
 
 DB_CONFIG = {
@@ -11,10 +19,6 @@ DB_CONFIG = {
     'password': 'logistics_password'
 }
 
-print("🚚 Упрощенная система управления логистикой и доставкой")
-print("📦 Скрипт заполнения БД реальными данными")
-print("=" * 60)
-
 EMPLOYEES_DATA = [
     ("Иван Петрович Семёнов", "Директор", "+7-911-111-1111", "2022-01-15"),
     ("Мария Александровна Козлова", "Менеджер", "+7-911-222-2222", "2021-06-10"),
@@ -68,9 +72,9 @@ ROUTES_DATA = [
     ("Москва - Омск", "Москва", "Омск", 2750),
 ]
 
-def connect_db():
+def connect_db(config=None):
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = psycopg2.connect(**(config or DB_CONFIG))
         print("✓ Подключение к БД успешно\n")
         return conn
     except psycopg2.Error as e:
@@ -204,9 +208,19 @@ def fill_orders(cursor, conn):
             print(f" ✗ Ошибка при добавлении заказа: {e}")
     conn.commit()
 
+def has_column(cursor, table, column):
+    cursor.execute("""
+        SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s)
+    """, (table, column))
+    return cursor.fetchone()[0]
+
 def fill_deliveries(cursor, conn):
     print("\n📝 Заполнение таблицы доставок...")
     statuses = ["Pending", "In Transit", "Delivered", "Failed"]
+    # После migrations/005_partitioning.sql доставки секционированы по created_at:
+    # без явного значения все строки попали бы в секцию текущего месяца
+    created_at = has_column(cursor, "delivery", "created_at")
     for i in range(1, 21):
         try:
             delivery_number = f"DEL-2024-{i:05d}"
@@ -219,9 +233,14 @@ def fill_deliveries(cursor, conn):
             delivery_cost = Decimal(str(round(random.uniform(500, 10000), 2)))
             status = random.choice(statuses)
             final_delivery_time = delivery_time if status == "Delivered" else None
+            columns = "delivery_number, order_id, vehicle_id, driver_id, route_id, recipient_name, recipient_phone, recipient_address, departure_time, delivery_time, status, delivery_cost"
+            values = [delivery_number, order_id, vehicle_id, driver_id, route_id, f"Получатель #{i}", f"+7-921-{random.randint(100, 999)}-{random.randint(1000, 9999)}", f"ул. Приемная, д. {random.randint(1, 200)}", departure_time, final_delivery_time, status, delivery_cost]
+            if created_at:
+                columns += ", created_at"
+                values.append(departure_time)
             cursor.execute(
-                "INSERT INTO delivery (delivery_number, order_id, vehicle_id, driver_id, route_id, recipient_name, recipient_phone, recipient_address, departure_time, delivery_time, status, delivery_cost) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                (delivery_number, order_id, vehicle_id, driver_id, route_id, f"Получатель #{i}", f"+7-921-{random.randint(100, 999)}-{random.randint(1000, 9999)}", f"ул. Приемная, д. {random.randint(1, 200)}", departure_time, final_delivery_time, status, delivery_cost)
+                f"INSERT INTO delivery ({columns}) VALUES ({', '.join(['%s'] * len(values))})",
+                values
             )
             print(f" ✓ Добавлена доставка: {delivery_number}")
         except Exception as e:
@@ -249,9 +268,248 @@ def display_statistics(cursor):
         print(f" {label}: {count}")
     print("=" * 60)
 
-def main():
-    print()
-    conn = connect_db()
+# ============= РЕЖИМ --scale: массовая генерация через COPY =============
+
+CUSTOMERS_PER_SCALE = 10_000
+ORDERS_PER_SCALE = 100_000
+
+CITY_WEIGHTS = [
+    ("Москва", 30), ("Санкт-Петербург", 15), ("Екатеринбург", 8), ("Новосибирск", 8),
+    ("Казань", 7), ("Челябинск", 6), ("Омск", 5), ("Самара", 5), ("Ростов-на-Дону", 5),
+    ("Нижний Новгород", 5), ("Краснодар", 4), ("Тверь", 2),
+]
+COMPANY_FORMS = ["ООО", "ООО", "ООО", "АО", "ИП"]
+COMPANY_WORDS = ["Альфа", "Бета", "Гамма", "Дельта", "Вектор", "Меридиан", "Сигма", "Орион",
+                 "Север", "Восток", "Прогресс", "Импульс", "Транзит", "Регион", "Ресурс"]
+COMPANY_KINDS = ["Логистика", "Торговля", "Импорт", "Дистрибьюция", "Снаб", "Маркет", "Опт", "Курьер"]
+FIRST_NAMES = ["Иван", "Пётр", "Анна", "Мария", "Сергей", "Ольга", "Дмитрий", "Елена",
+               "Алексей", "Наталья", "Михаил", "Юлия", "Андрей", "Татьяна", "Николай"]
+LAST_NAMES = ["Иванов", "Петров", "Сидоров", "Кузнецов", "Смирнов", "Волков", "Морозов",
+              "Орлов", "Соколов", "Новиков", "Фёдоров", "Макаров", "Романов", "Беляев"]
+STREETS = ["ул. Ленина", "ул. Садовая", "пр-т Мира", "ул. Советская", "ул. Заводская",
+           "ул. Гагарина", "Набережная ул.", "ул. Промышленная", "ул. Лесная", "ул. Школьная"]
+
+ORDER_COLUMNS = ("order_id", "order_number", "customer_id", "warehouse_id", "order_date",
+                 "delivery_date", "status", "cost")
+DELIVERY_COLUMNS = ("delivery_id", "delivery_number", "order_id", "vehicle_id", "driver_id", "route_id",
+                    "recipient_name", "recipient_phone", "recipient_address", "departure_time",
+                    "delivery_time", "status", "delivery_cost")
+CUSTOMER_COLUMNS = ("customer_id", "company_name", "contact_person", "phone", "city", "address")
+
+# Параметры генератора, общие для всех процессов (заполняются в init_worker)
+_worker = {}
+
+def cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+def zipf_weights(n, s):
+    """Веса закона Ципфа: клиент ранга k делает заказы с частотой ~ 1 / k^s"""
+    return cumulative(1.0 / (k ** s) for k in range(1, n + 1))
+
+def seasonal_days(end_date, days):
+    """
+    Дни периода и накопленные веса: пик в декабре, спад летом,
+    меньше заказов в выходные и рост объёма к концу периода
+    """
+    dates, weights = [], []
+    for i in range(days):
+        day = end_date - timedelta(days=days - 1 - i)
+        season = 1 + 0.35 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 350) / 365)
+        weekday = 0.6 if day.weekday() >= 5 else 1.0
+        trend = 0.7 + 0.3 * i / max(days - 1, 1)
+        dates.append(day)
+        weights.append(season * weekday * trend)
+    return dates, cumulative(weights)
+
+def order_status(rng, age_days):
+    """Статус заказа в зависимости от его давности"""
+    if age_days <= 2:
+        return "Pending" if rng.random() < 0.6 else "Processing"
+    if age_days <= 7:
+        return rng.choices(["Processing", "In Transit", "Delivered"], [0.3, 0.6, 0.1])[0]
+    if age_days <= 14:
+        return "In Transit" if rng.random() < 0.3 else "Delivered"
+    return "Delivered" if rng.random() < 0.98 else "In Transit"
+
+def person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+def phone_number(rng):
+    return f"+7-9{rng.randint(10, 99)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}"
+
+def street_address(rng):
+    return f"{rng.choice(STREETS)}, д. {rng.randint(1, 250)}"
+
+def chunk_rng(seed, kind, index):
+    """Отдельный генератор на каждый блок: результат не зависит от числа процессов"""
+    return random.Random(f"{seed}:{kind}:{index}")
+
+def copy_rows(cursor, table, columns, rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+def init_worker(params):
+    _worker.update(params)
+    _worker["conn"] = psycopg2.connect(**params["db"])
+    _worker["customer_weights"] = zipf_weights(params["customers"], params["zipf"])
+    _worker["dates"], _worker["date_weights"] = seasonal_days(params["end_date"], params["days"])
+
+def generate_customers(task):
+    """Сгенерировать и загрузить блок клиентов, вернуть число строк"""
+    index, first, count = task
+    rng = chunk_rng(_worker["seed"], "customer", index)
+    cities, city_weights = zip(*CITY_WEIGHTS)
+    city_weights = cumulative(city_weights)
+    rows = []
+    for customer_id in range(first, first + count):
+        company = (f"{rng.choice(COMPANY_FORMS)} \"{rng.choice(COMPANY_WORDS)} "
+                   f"{rng.choice(COMPANY_KINDS)} {customer_id}\"")
+        rows.append((customer_id, company, person_name(rng), phone_number(rng),
+                     rng.choices(cities, cum_weights=city_weights)[0], street_address(rng)))
+    conn = _worker["conn"]
+    with conn.cursor() as cursor:
+        copy_rows(cursor, "customer", CUSTOMER_COLUMNS, rows)
+    conn.commit()
+    return len(rows)
+
+def generate_orders(task):
+    """Сгенерировать и загрузить блок заказов вместе с их доставками, вернуть число строк"""
+    index, first, count = task
+    w = _worker
+    rng = chunk_rng(w["seed"], "order", index)
+    customer_ids = range(w["customer_base"] + 1, w["customer_base"] + w["customers"] + 1)
+    customers = rng.choices(customer_ids, cum_weights=w["customer_weights"], k=count)
+    order_dates = rng.choices(w["dates"], cum_weights=w["date_weights"], k=count)
+    orders, deliveries = [], []
+    for order_id, customer_id, order_date in zip(range(first, first + count), customers, order_dates):
+        status = order_status(rng, (w["end_date"] - order_date).days)
+        cost = min(rng.lognormvariate(9.3, 0.8), 5_000_000)
+        orders.append((order_id, f"ORD-{order_date.year}-{order_id:08d}", customer_id,
+                       rng.choice(w["warehouse_ids"]), order_date,
+                       order_date + timedelta(days=rng.randint(3, 14)), status, f"{cost:.2f}"))
+        if status not in ("In Transit", "Delivered"):
+            continue
+        # Номера доставок берутся из зарезервированного диапазона по номеру заказа
+        delivery_id = w["delivery_base"] + order_id - w["order_base"]
+        departure = datetime.combine(order_date, datetime.min.time()) + timedelta(
+            days=rng.randint(0, 2), hours=rng.randint(6, 20), minutes=rng.randint(0, 59))
+        delivery_status = status
+        if status == "Delivered" and rng.random() < 0.02:
+            delivery_status = "Failed"
+        delivered_at = departure + timedelta(hours=rng.randint(4, 72)) if delivery_status == "Delivered" else None
+        deliveries.append((delivery_id, f"DEL-{order_date.year}-{delivery_id:08d}", order_id,
+                           rng.choice(w["vehicle_ids"]), rng.choice(w["driver_ids"]),
+                           rng.choice(w["route_ids"]), person_name(rng), phone_number(rng),
+                           street_address(rng), departure, delivered_at, delivery_status,
+                           f"{cost * rng.uniform(0.05, 0.2):.2f}") + ((departure,) if w["delivery_created_at"] else ()))
+    conn = w["conn"]
+    with conn.cursor() as cursor:
+        copy_rows(cursor, "order_item", ORDER_COLUMNS, orders)
+        copy_rows(cursor, "delivery",
+                  DELIVERY_COLUMNS + (("created_at",) if w["delivery_created_at"] else ()), deliveries)
+    conn.commit()
+    return len(orders) + len(deliveries)
+
+def reserve_ids(cursor, table, column, count):
+    """
+    Зарезервировать диапазон из count идентификаторов: сдвинуть последовательность
+    SERIAL-колонки, чтобы параллельные вставки через API не пересеклись с загрузкой.
+    Возвращает последний занятый до резерва идентификатор.
+    """
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", (table, column))
+    sequence = cursor.fetchone()[0]
+    cursor.execute(f"SELECT GREATEST(COALESCE(MAX({column}), 0), (SELECT last_value FROM {sequence})) FROM {table}")
+    base = cursor.fetchone()[0]
+    cursor.execute("SELECT setval(%s, %s)", (sequence, base + count))
+    return base
+
+def reference_ids(cursor, table, column):
+    cursor.execute(f"SELECT {column} FROM {table} ORDER BY {column}")
+    return [row[0] for row in cursor.fetchall()]
+
+def run_chunks(pool, func, first, total, chunk_size, label):
+    tasks = [(i, first + offset, min(chunk_size, total - offset))
+             for i, offset in enumerate(range(0, total, chunk_size))]
+    started = time.monotonic()
+    rows = 0
+    for done, loaded in enumerate(pool.imap_unordered(func, tasks), 1):
+        rows += loaded
+        rate = rows / max(time.monotonic() - started, 1e-9)
+        print(f" ✓ {label}: блок {done}/{len(tasks)}, {rows:,} строк ({rate:,.0f} строк/с)")
+    return rows, time.monotonic() - started
+
+def populate_scale(args):
+    """Загрузить данные масштаба args.scale; False, если загрузка не началась"""
+    db = {"dsn": args.dsn} if args.dsn else DB_CONFIG
+    conn = connect_db(db)
+    if not conn:
+        return False
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM warehouse")
+        if cursor.fetchone()[0] == 0:
+            fill_employees(cursor, conn)
+            fill_drivers(cursor, conn)
+            fill_vehicles(cursor, conn)
+            fill_warehouses(cursor, conn)
+            fill_routes(cursor, conn)
+
+        customers = CUSTOMERS_PER_SCALE * args.scale
+        orders = ORDERS_PER_SCALE * args.scale
+        params = {
+            "db": db,
+            "seed": args.seed,
+            "zipf": args.zipf,
+            "end_date": args.end_date,
+            "days": args.days,
+            "customers": customers,
+            "warehouse_ids": reference_ids(cursor, "warehouse", "warehouse_id"),
+            "vehicle_ids": reference_ids(cursor, "vehicle", "vehicle_id"),
+            "driver_ids": reference_ids(cursor, "driver", "driver_id"),
+            "route_ids": reference_ids(cursor, "route", "route_id"),
+            # Ключ секционирования доставок (migrations/005_partitioning.sql) - время отправления
+            "delivery_created_at": has_column(cursor, "delivery", "created_at"),
+            "customer_base": reserve_ids(cursor, "customer", "customer_id", customers),
+            "order_base": reserve_ids(cursor, "order_item", "order_id", orders),
+            "delivery_base": reserve_ids(cursor, "delivery", "delivery_id", orders),
+        }
+        conn.commit()
+        for key in ("warehouse_ids", "vehicle_ids", "driver_ids", "route_ids"):
+            if not params[key]:
+                print(f"✗ Справочная таблица пуста ({key}), заполните БД без --scale")
+                return False
+
+        print(f"\n📦 Масштаб {args.scale}: {customers:,} клиентов, {orders:,} заказов "
+              f"(seed={args.seed}, процессов: {args.workers}, блок: {args.chunk_size:,})")
+        started = time.monotonic()
+        with multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(params,)) as pool:
+            customer_rows, customer_time = run_chunks(
+                pool, generate_customers, params["customer_base"] + 1, customers, args.chunk_size, "клиенты")
+            order_rows, order_time = run_chunks(
+                pool, generate_orders, params["order_base"] + 1, orders, args.chunk_size, "заказы и доставки")
+
+        print("\n📝 Обновление статистики планировщика...")
+        conn.autocommit = True
+        cursor.execute("ANALYZE customer")
+        cursor.execute("ANALYZE order_item")
+        cursor.execute("ANALYZE delivery")
+
+        elapsed = time.monotonic() - started
+        rows = customer_rows + order_rows
+        print(f" Клиенты: {customer_rows:,} строк за {customer_time:.1f} с ({customer_rows / customer_time:,.0f} строк/с)")
+        print(f" Заказы и доставки: {order_rows:,} строк за {order_time:.1f} с ({order_rows / order_time:,.0f} строк/с)")
+        print(f" Итого: {rows:,} строк за {elapsed:.1f} с ({rows / elapsed:,.0f} строк/с)")
+        display_statistics(cursor)
+        print("\n✅ ВСЕ ДАННЫЕ УСПЕШНО ЗАГРУЖЕНЫ В БД!")
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+def populate_demo(dsn=None):
+    conn = connect_db({"dsn": dsn} if dsn else None)
     if not conn:
         return
     cursor = conn.cursor()
@@ -273,5 +531,31 @@ def main():
         cursor.close()
         conn.close()
 
+def main():
+    parser = argparse.ArgumentParser(description="Заполнение БД логистики")
+    parser.add_argument("--scale", type=int, default=0,
+                        help=f"масштаб: N x {CUSTOMERS_PER_SCALE:,} клиентов и N x {ORDERS_PER_SCALE:,} заказов "
+                             "(без параметра загружается демонстрационный набор)")
+    parser.add_argument("--seed", type=int, default=42, help="seed генератора (по умолчанию 42)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов загрузки")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="строк заказов/клиентов в одном COPY")
+    parser.add_argument("--days", type=int, default=730, help="глубина истории заказов, дней")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date.today(),
+                        help="последний день истории, ГГГГ-ММ-ДД (для воспроизводимости задайте явно)")
+    parser.add_argument("--zipf", type=float, default=1.1, help="показатель распределения Ципфа по клиентам")
+    parser.add_argument("--dsn", help="строка подключения вместо DB_CONFIG (например, БД benchmark.py)")
+    args = parser.parse_args()
+
+    print("🚚 Упрощенная система управления логистикой и доставкой")
+    print("📦 Скрипт заполнения БД реальными данными")
+    print("=" * 60)
+    print()
+    if args.scale > 0:
+        if not populate_scale(args):
+            raise SystemExit(1)
+    else:
+        populate_demo(args.dsn)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""
+Профилировщик SQL-запросов: медленные запросы и N+1.
+
+Запросы приходят из тех же точек, что и метрики (metrics.record_query):
+событий движка SQLAlchemy и курсоров psycopg2 (TimedConnection).
+
+- запрос дольше SLOW_QUERY_MS пишется в лог с нормализованным текстом,
+  параметрами и планом и попадает в кольцевой буфер;
+- план получается EXPLAIN (только оценки, без выполнения) на том же подключении
+  внутри точки сохранения, которая затем откатывается. EXPLAIN ANALYZE повторно
+  выполняет и без того медленный запрос, поэтому включается только явно
+  (SLOW_QUERY_EXPLAIN_ANALYZE) и только для чтения (SELECT/WITH без записи)
+  без вызовов функций: SELECT rebuild_driver_performance() не перезапускается;
+  план одного и того же запроса берётся из кэша SLOW_QUERY_EXPLAIN_TTL секунд;
+- если за HTTP-запрос один и тот же (с точностью до литералов) SQL выполнен
+  N_PLUS_ONE_THRESHOLD раз и больше, это записывается как подозрение на N+1.
+
+Буферы читаются через GET /api/debug/slow-queries.
+
+Если задан QUERY_CAPTURE_FILE, первый запрос на чтение каждого вида
+(с параметрами) дописывается в этот файл JSON-строкой - это нагрузка
+для index_advisor.py.
+"""
+
+from collections import deque
+from datetime import datetime
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+from cache import TTLCache
+from metrics import add_query_listener
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_EXPLAIN_ANALYZE = os.getenv("SLOW_QUERY_EXPLAIN_ANALYZE", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+QUERY_CAPTURE_FILE = os.getenv("QUERY_CAPTURE_FILE", "")
+
+plan_cache = TTLCache(maxsize=256, ttl=float(os.getenv("SLOW_QUERY_EXPLAIN_TTL", "300")))
+
+_slow_queries = deque(maxlen=SLOW_QUERY_BUFFER_SIZE)
+_n_plus_one = deque(maxlen=SLOW_QUERY_BUFFER_SIZE)
+_lock = threading.Lock()
+_captured = set()
+
+# ============= НОРМАЛИЗАЦИЯ =============
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH|VALUES|TABLE)\b", re.I)
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|NEXTVAL|SETVAL|PG_ADVISORY\w*|PG_NOTIFY)\b", re.I)
+_CALLS = re.compile(r"(?<![\w.\"])([a-z_][\w.]*)\s*\(", re.I)
+
+# Ключевые слова перед скобкой и встроенные функции без побочных эффектов;
+# всё остальное вида name(...) считается вызовом функции
+SAFE_CALLS = frozenset({
+    "select", "from", "join", "as", "in", "on", "and", "or", "not", "where", "exists", "any", "all",
+    "values", "using", "over", "filter", "partition", "by", "case", "when", "then", "else", "lateral",
+    "union", "intersect", "except", "with", "materialized", "row", "array", "between", "is", "like",
+    "count", "sum", "avg", "min", "max", "coalesce", "nullif", "greatest", "least", "round", "abs",
+    "lower", "upper", "length", "substring", "trim", "concat", "extract", "date_trunc", "date_part",
+    "cast", "to_char", "to_date", "now", "age", "row_number", "rank", "dense_rank", "lag", "lead",
+    "array_agg", "string_agg", "json_agg", "json_build_object", "json_build_array", "jsonb_agg",
+    "jsonb_build_object", "bool_and", "bool_or", "percentile_cont", "percentile_disc", "within",
+    "numeric", "decimal", "varchar", "char", "interval",
+})
+
+
+def normalize(statement):
+    """Текст запроса без литералов и параметров: WHERE id = 5 и WHERE id = %s дают WHERE id = ?"""
+    text = _COMMENTS.sub(" ", str(statement))
+    text = _STRINGS.sub("?", text)
+    text = _PLACEHOLDERS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _LISTS.sub("(...)", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+# ============= EXPLAIN =============
+
+_explaining = contextvars.ContextVar("profiler_explaining", default=False)
+
+
+def is_read_only(statement):
+    return bool(_READ_ONLY.match(statement)) and not _WRITES.search(statement)
+
+
+def calls_functions(statement):
+    """Есть ли в запросе вызовы функций, кроме встроенных без побочных эффектов"""
+    text = _STRINGS.sub("''", _COMMENTS.sub(" ", statement))
+    return any(name.lower() not in SAFE_CALLS for name in _CALLS.findall(text))
+
+
+def can_analyze(statement):
+    """Можно ли выполнить запрос повторно ради EXPLAIN ANALYZE"""
+    return is_read_only(statement) and not calls_functions(statement)
+
+
+def explain(connection, statement, parameters):
+    """
+    План запроса на подключении connection. Выполняется в точке сохранения,
+    которая всегда откатывается, поэтому транзакция запроса не меняется.
+    """
+    options = "ANALYZE, BUFFERS" if SLOW_QUERY_EXPLAIN_ANALYZE and can_analyze(statement) else "COSTS"
+    token = _explaining.set(True)
+    cur = connection.cursor()
+    try:
+        cur.execute("SAVEPOINT query_profiler")
+        try:
+            cur.execute(f"EXPLAIN ({options}) {statement}", parameters)
+            return "\n".join(row[0] for row in cur.fetchall())
+        finally:
+            cur.execute("ROLLBACK TO SAVEPOINT query_profiler")
+            cur.execute("RELEASE SAVEPOINT query_profiler")
+    finally:
+        cur.close()
+        _explaining.reset(token)
+
+
+def cached_plan(key, connection, statement, parameters):
+    plan = plan_cache.get("plans", key)
+    if plan is not None or connection is None or not SLOW_QUERY_EXPLAIN or not isinstance(statement, str):
+        return plan
+    try:
+        plan = explain(connection, statement, parameters)
+    except Exception as e:
+        logger.debug(f"EXPLAIN не выполнен: {e}")
+        return None
+    plan_cache.set("plans", key, plan)
+    return plan
+
+# ============= СБОР =============
+
+def capture(statement, parameters):
+    """Дописать запрос в QUERY_CAPTURE_FILE, если запрос такого вида ещё не записан"""
+    if not isinstance(statement, str) or not can_analyze(statement):
+        return
+    normalized = normalize(statement)
+    key = fingerprint(normalized)
+    with _lock:
+        if key in _captured:
+            return
+        _captured.add(key)
+        line = json.dumps({"fingerprint": key, "statement": statement, "parameters": parameters},
+                          ensure_ascii=False, default=str)
+        with open(QUERY_CAPTURE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+class _RequestQueries:
+    __slots__ = ("method", "path", "statements")
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.statements = {}   # текст запроса -> [число выполнений, секунды]
+
+
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def _short(value, limit=500):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def on_query(seconds, statement, parameters, connection):
+    if statement is None or _explaining.get():
+        return
+    if QUERY_CAPTURE_FILE:
+        capture(statement, parameters)
+    request = _request_queries.get()
+    if request is not None:
+        counter = request.statements.get(statement)
+        if counter is None:
+            request.statements[statement] = [1, seconds]
+        else:
+            counter[0] += 1
+            counter[1] += seconds
+
+    if seconds * 1000 < SLOW_QUERY_MS:
+        return
+    normalized = normalize(statement)
+    key = fingerprint(normalized)
+    plan = cached_plan(key, connection, statement, parameters)
+    entry = {
+        "at": datetime.now().isoformat(timespec="milliseconds"),
+        "duration_ms": round(seconds * 1000, 3),
+        "fingerprint": key,
+        "statement": normalized,
+        "parameters": _short(parameters) if parameters is not None else None,
+        "request": f"{request.method} {request.path}" if request else None,
+        "plan": plan,
+    }
+    with _lock:
+        _slow_queries.append(entry)
+    logger.warning(
+        f"Медленный запрос {entry['duration_ms']} мс ({entry['request']}): {normalized}\n"
+        f"Параметры: {entry['parameters']}" + (f"\n{plan}" if plan else "")
+    )
+
+
+def check_n_plus_one(request, route):
+    """Сгруппировать запросы HTTP-запроса по нормализованному тексту и найти повторы"""
+    if sum(count for count, _ in request.statements.values()) < N_PLUS_ONE_THRESHOLD:
+        return
+    groups = {}
+    for statement, (count, seconds) in request.statements.items():
+        group = groups.setdefault(normalize(statement), [0, 0.0])
+        group[0] += count
+        group[1] += seconds
+    for normalized, (count, seconds) in groups.items():
+        if count < N_PLUS_ONE_THRESHOLD:
+            continue
+        entry = {
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "request": f"{request.method} {route}",
+            "path": request.path,
+            "count": count,
+            "total_ms": round(seconds * 1000, 3),
+            "fingerprint": fingerprint(normalized),
+            "statement": normalized,
+        }
+        with _lock:
+            _n_plus_one.append(entry)
+        logger.warning(f"Возможный N+1: {entry['request']} выполнил {count} раз: {normalized}")
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware: собирает SQL-запросы HTTP-запроса для поиска N+1"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = _RequestQueries(scope["method"], scope["path"])
+        token = _request_queries.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_queries.reset(token)
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            check_n_plus_one(request, route)
+
+
+def slow_query_report(limit=50):
+    """Самые медленные из последних запросов и последние подозрения на N+1"""
+    with _lock:
+        slow = sorted(_slow_queries, key=lambda e: e["duration_ms"], reverse=True)[:limit]
+        n_plus_one = list(_n_plus_one)[::-1][:limit]
+    return {
+        "threshold_ms": SLOW_QUERY_MS,
+        "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD,
+        "slow_queries": slow,
+        "n_plus_one": n_plus_one,
+    }
+
+
+def clear_slow_queries():
+    with _lock:
+        _slow_queries.clear()
+        _n_plus_one.clear()
+    plan_cache.clear()
+
+
+add_query_listener(on_query)
@@ -0,0 +1,274 @@
+"""
+Чтение с реплик PostgreSQL.
+
+Адреса реплик задаются в DATABASE_REPLICA_URLS через запятую. GET-запросы
+читают с реплик по кругу, запись и остальные методы идут на основную БД.
+
+- фоновый поток раз в REPLICA_CHECK_INTERVAL секунд проверяет каждую реплику
+  и её отставание; недоступная или отстающая больше REPLICA_MAX_LAG_SECONDS
+  реплика не выбирается до следующей удачной проверки;
+- если подходящих реплик нет, чтение идёт на основную БД;
+- чтение своих записей: после успешного изменяющего запроса клиент получает
+  cookie read_primary_until, и READ_YOUR_WRITES_SECONDS секунд его GET-запросы
+  читают с основной БД. Заголовок X-Read-Consistency: primary делает то же
+  для одного запроса.
+"""
+
+from http.cookies import CookieError, SimpleCookie
+import contextvars
+import itertools
+import logging
+import math
+import os
+import re
+import threading
+import time
+
+import psycopg2
+
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "2"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+PRIMARY_COOKIE = "read_primary_until"
+CONSISTENCY_HEADER = b"x-read-consistency"
+READ_METHODS = ("GET", "HEAD")
+# Запросы, после которых клиент читает с основной БД (OPTIONS и прочие - не записи)
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+REPLICA_LAG = Gauge("db_replica_lag_seconds", "Отставание реплики по последней проверке", ("replica",))
+REPLICA_HEALTHY = Gauge("db_replica_healthy", "Реплика используется для чтения", ("replica",))
+READS = Counter("db_reads_total", "Подключения для чтения по месту чтения", ("target",))
+
+# Если реплика получила и применила весь WAL, отставания нет, даже когда на
+# основной БД давно не было транзакций и pg_last_xact_replay_timestamp() старый
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def mask_url(url):
+    """Адрес без пароля для логов и /api/system/replicas"""
+    return re.sub(r"//([^:/@]+):[^@]*@", r"//\1:***@", url)
+
+
+class _Replica:
+    __slots__ = ("url", "healthy", "lag", "error", "checked_at", "reads", "conn")
+
+    def __init__(self, url):
+        self.url = url
+        self.healthy = False
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+        self.reads = 0
+        self.conn = None
+
+
+class ReplicaSet:
+    """Реплики для чтения: проверка состояния и выбор по кругу"""
+
+    def __init__(self, urls, max_lag=REPLICA_MAX_LAG_SECONDS, check_interval=REPLICA_CHECK_INTERVAL,
+                 connect_timeout=2):
+        self.replicas = [_Replica(url) for url in urls]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.connect_timeout = connect_timeout
+        self.primary_fallbacks = 0
+        self._next = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self.replicas)
+
+    @property
+    def urls(self):
+        return [replica.url for replica in self.replicas]
+
+    # ----- проверки -----
+
+    def start(self):
+        """Проверить реплики сразу и запустить фоновые проверки"""
+        if not self.replicas or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self.check_all()
+        self._thread = threading.Thread(target=self._run, name="replica-checker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.connect_timeout + 1)
+            self._thread = None
+        for replica in self.replicas:
+            self._disconnect(replica)
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            self.check_all()
+
+    def check_all(self):
+        for replica in self.replicas:
+            self.check(replica)
+
+    def check(self, replica):
+        try:
+            if replica.conn is None or replica.conn.closed:
+                replica.conn = psycopg2.connect(replica.url, connect_timeout=self.connect_timeout)
+                replica.conn.autocommit = True
+            with replica.conn.cursor() as cur:
+                cur.execute(LAG_QUERY)
+                lag = float(cur.fetchone()[0])
+        except psycopg2.Error as e:
+            self._disconnect(replica)
+            if replica.healthy or replica.error is None:
+                logger.warning(f"Реплика {mask_url(replica.url)} недоступна: {e}")
+            replica.healthy, replica.lag, replica.error = False, None, str(e).strip()
+            REPLICA_LAG.set(math.nan, mask_url(replica.url))
+        else:
+            healthy = lag <= self.max_lag
+            if healthy != replica.healthy:
+                logger.info(f"Реплика {mask_url(replica.url)}: отставание {lag:.3f} с, "
+                            + ("используется для чтения" if healthy else "исключена из чтения"))
+            replica.healthy, replica.lag, replica.error = healthy, lag, None
+            REPLICA_LAG.set(lag, mask_url(replica.url))
+        replica.checked_at = time.monotonic()
+        REPLICA_HEALTHY.set(int(replica.healthy), mask_url(replica.url))
+
+    @staticmethod
+    def _disconnect(replica):
+        if replica.conn is not None:
+            try:
+                replica.conn.close()
+            except psycopg2.Error:
+                pass
+            replica.conn = None
+
+    # ----- выбор -----
+
+    def _usable(self, replica, now):
+        # Зависшая проверка не должна оставлять реплику годной бесконечно
+        return (replica.healthy and replica.checked_at is not None
+                and now - replica.checked_at <= 3 * self.check_interval + self.connect_timeout)
+
+    def pick(self):
+        """Индекс реплики для чтения или None, если читать с основной БД"""
+        if not self.replicas:
+            return None
+        now = time.monotonic()
+        candidates = [i for i, replica in enumerate(self.replicas) if self._usable(replica, now)]
+        if not candidates:
+            self.primary_fallbacks += 1
+            READS.inc("primary_fallback")
+            return None
+        index = candidates[next(self._next) % len(candidates)]
+        self.replicas[index].reads += 1
+        READS.inc("replica")
+        return index
+
+    def mark_down(self, index, error):
+        """Исключить реплику до следующей проверки (ошибка подключения при чтении)"""
+        replica = self.replicas[index]
+        replica.healthy, replica.error = False, str(error).strip()
+        REPLICA_HEALTHY.set(0, mask_url(replica.url))
+        logger.warning(f"Реплика {mask_url(replica.url)} исключена из чтения: {error}")
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "max_lag_seconds": self.max_lag,
+            "check_interval_seconds": self.check_interval,
+            "read_your_writes_seconds": READ_YOUR_WRITES_SECONDS,
+            "primary_fallbacks": self.primary_fallbacks,
+            "replicas": [
+                {
+                    "url": mask_url(replica.url),
+                    "healthy": self._usable(replica, now),
+                    "lag_seconds": replica.lag,
+                    "checked_ago_seconds": round(now - replica.checked_at, 3) if replica.checked_at else None,
+                    "reads": replica.reads,
+                    "error": replica.error,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+# ============= ЧТЕНИЕ СВОИХ ЗАПИСЕЙ =============
+
+_replica_allowed = contextvars.ContextVar("replica_allowed", default=False)
+
+
+def replica_allowed():
+    """Может ли текущий HTTP-запрос читать с реплики"""
+    return _replica_allowed.get()
+
+
+def _primary_until(headers):
+    for name, value in headers:
+        if name == b"cookie":
+            try:
+                cookie = SimpleCookie(value.decode("latin-1"))
+            except CookieError:
+                continue
+            if PRIMARY_COOKIE in cookie:
+                try:
+                    return float(cookie[PRIMARY_COOKIE].value)
+                except ValueError:
+                    return 0.0
+    return 0.0
+
+
+class ReadRoutingMiddleware:
+    """
+    ASGI middleware: разрешает GET/HEAD читать с реплик и после успешной
+    записи (POST/PUT/PATCH/DELETE) ставит клиенту cookie, переводящий его
+    чтение на основную БД
+    """
+
+    def __init__(self, app, window=READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in READ_METHODS:
+            headers = scope["headers"]
+            primary = (any(name == CONSISTENCY_HEADER and value.strip().lower() == b"primary"
+                           for name, value in headers)
+                       or _primary_until(headers) > time.time())
+            token = _replica_allowed.set(not primary)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _replica_allowed.reset(token)
+            return
+
+        if scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and self.window > 0:
+                until = math.ceil(time.time() + self.window)
+                cookie = f"{PRIMARY_COOKIE}={until}; Max-Age={math.ceil(self.window)}; Path=/; SameSite=Lax"
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+replicas = ReplicaSet(REPLICA_URLS)
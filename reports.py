@@ -0,0 +1,331 @@
+"""
+Именованные отчёты из analytics_queries.sql.
+
+Каждый запрос файла с пометкой "-- report: <имя>" доступен как отчёт
+GET /api/reports/<имя> с необязательными параметрами:
+- date_from / date_to - период включительно: заказы по order_date,
+  отправки и доставки по created_at;
+- warehouse_id - склад: заказы склада, их отправки и доставки.
+
+Текст запросов в файле не меняется и по-прежнему выполняется вручную.
+Параметры применяются подменой таблиц одноимёнными CTE с фильтром:
+    WITH orders AS NOT MATERIALIZED (SELECT * FROM orders WHERE ...) <запрос>
+NOT MATERIALIZED встраивает CTE в запрос, поэтому условие на ключ
+секционирования отсекает секции других месяцев.
+
+Результаты кэшируются по (отчёт, параметры) на REPORT_CACHE_TTL секунд,
+одинаковые холодные запросы выполняются один раз. Фоновый поток при старте
+прогревает отчёты без параметров и пересчитывает заранее записи, которые
+запрашивались за последние REPORT_HOT_WINDOW секунд и устареют в ближайшие
+REPORT_REFRESH_AHEAD секунд.
+"""
+
+from datetime import datetime, timedelta
+import logging
+import os
+import re
+import threading
+import time
+
+from psycopg2.extras import RealDictCursor
+
+from cache import TTLCache
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "300"))
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "256"))
+REPORT_REFRESH_AHEAD = float(os.getenv("REPORT_REFRESH_AHEAD", "60"))
+REPORT_REFRESH_INTERVAL = float(os.getenv("REPORT_REFRESH_INTERVAL", "10"))
+REPORT_HOT_WINDOW = float(os.getenv("REPORT_HOT_WINDOW", "900"))
+REPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("REPORT_STATEMENT_TIMEOUT_MS", "30000"))
+REPORT_PREWARM = os.getenv("REPORT_PREWARM", "true").lower() == "true"
+
+REPORT_RUNS = Counter("report_runs_total", "Выполнения отчётов", ("report", "trigger"))
+REPORT_DURATION = Histogram("report_duration_seconds", "Время выполнения отчёта", ("report",))
+
+SECTION_RE = re.compile(r"^--\s*\d+\.\s+(.+)$")
+REPORT_RE = re.compile(r"^--\s*report:\s*([a-z0-9_]+)\s*$")
+TABLE_RE = re.compile(r"\b(?:FROM|JOIN)\s+(orders|shipments|deliveries|warehouses)\b", re.IGNORECASE)
+WITH_RE = re.compile(r"^\s*WITH\s+", re.IGNORECASE)
+RECURSIVE_RE = re.compile(r"^\s*WITH\s+RECURSIVE\b", re.IGNORECASE)
+
+# Фильтры подменяемых таблиц. Порядок важен: в теле CTE видны только CTE,
+# объявленные раньше, поэтому таблицы, через которые фильтруются другие,
+# подменяются последними - подзапросы читают исходные таблицы
+FILTERS = (
+    ("deliveries", (
+        ("date_from", "created_at >= %(time_from)s"),
+        ("date_to", "created_at < %(time_to)s"),
+        ("warehouse_id", "shipment_id IN (SELECT s.shipment_id FROM shipments s "
+                         "JOIN orders o ON o.order_id = s.order_id WHERE o.warehouse_id = %(warehouse_id)s)"),
+    )),
+    ("shipments", (
+        ("date_from", "created_at >= %(time_from)s"),
+        ("date_to", "created_at < %(time_to)s"),
+        ("warehouse_id", "order_id IN (SELECT order_id FROM orders WHERE warehouse_id = %(warehouse_id)s)"),
+    )),
+    ("orders", (
+        ("date_from", "order_date >= %(date_from)s"),
+        ("date_to", "order_date <= %(date_to)s"),
+        ("warehouse_id", "warehouse_id = %(warehouse_id)s"),
+    )),
+    ("warehouses", (
+        ("warehouse_id", "warehouse_id = %(warehouse_id)s"),
+    )),
+)
+PARAMETERS = ("date_from", "date_to", "warehouse_id")
+
+
+class ReportError(Exception):
+    """Параметры не подходят отчёту"""
+
+
+class UnknownReportError(ReportError):
+    """Отчёта с таким именем нет"""
+
+
+def _start_of_day(value):
+    return datetime(value.year, value.month, value.day)
+
+
+class Report:
+    """Запрос из analytics_queries.sql и таблицы, которые можно фильтровать"""
+
+    __slots__ = ("name", "title", "section", "sql", "tables")
+
+    def __init__(self, name, title, section, sql):
+        self.name = name
+        self.title = title
+        self.section = section
+        self.sql = sql.rstrip().rstrip(";")
+        self.tables = {match.group(1).lower() for match in TABLE_RE.finditer(self.sql)}
+
+    @property
+    def parameters(self):
+        if RECURSIVE_RE.match(self.sql):
+            return ()
+        supported = {param for table, filters in FILTERS if table in self.tables for param, _ in filters}
+        return tuple(param for param in PARAMETERS if param in supported)
+
+    def query(self, date_from=None, date_to=None, warehouse_id=None):
+        """Текст запроса с подменой таблиц и именованные параметры для него"""
+        given = {"date_from": date_from, "date_to": date_to, "warehouse_id": warehouse_id}
+        unsupported = [name for name, value in given.items() if value is not None and name not in self.parameters]
+        if unsupported:
+            raise ReportError(f"Отчёт {self.name} не поддерживает параметры: {', '.join(unsupported)}")
+        if date_from and date_to and date_from > date_to:
+            raise ReportError("date_from позже date_to")
+
+        args = {
+            **given,
+            "time_from": _start_of_day(date_from) if date_from else None,
+            "time_to": _start_of_day(date_to + timedelta(days=1)) if date_to else None,
+        }
+        # Параметры передаются всегда, поэтому % в тексте отчёта экранируется
+        sql = self.sql.replace("%", "%%")
+        ctes = []
+        for table, filters in FILTERS:
+            conditions = [condition for param, condition in filters if given[param] is not None]
+            if table in self.tables and conditions:
+                ctes.append(f"{table} AS NOT MATERIALIZED (SELECT * FROM {table} WHERE {' AND '.join(conditions)})")
+        if not ctes:
+            return sql, args
+        head = WITH_RE.match(sql)
+        if head:
+            return "WITH " + ",\n".join(ctes) + ",\n" + sql[head.end():], args
+        return "WITH " + ",\n".join(ctes) + "\n" + sql, args
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "title": self.title,
+            "section": self.section,
+            "parameters": list(self.parameters),
+        }
+
+
+def load_reports(path):
+    """Отчёты из SQL-файла: запросы, перед которыми стоит "-- report: <имя>" """
+    reports = {}
+    section = title = name = None
+    statement = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stripped = line.strip()
+            if not statement:
+                if not stripped:
+                    continue
+                if stripped.startswith("--"):
+                    comment = stripped[2:].strip()
+                    report, heading = REPORT_RE.match(stripped), SECTION_RE.match(stripped)
+                    if report:
+                        name = report.group(1)
+                    elif heading:
+                        section = heading.group(1).strip()
+                    elif comment.strip("="):
+                        title = comment
+                    continue
+            statement.append(line)
+            if stripped.endswith(";"):
+                if name:
+                    if name in reports:
+                        raise ValueError(f"Отчёт {name} объявлен в {path} дважды")
+                    reports[name] = Report(name, title, section, "".join(statement))
+                statement, title, name = [], None, None
+    return reports
+
+
+class ReportEngine:
+    """
+    Выполнение отчётов с кэшем результатов.
+
+    connection - функция без аргументов, возвращающая контекстный менеджер
+    подключения (ConnectionPool.connection()); serialize - преобразование строки.
+    """
+
+    def __init__(self, path, connection, serialize=dict, ttl=REPORT_CACHE_TTL, maxsize=REPORT_CACHE_SIZE,
+                 refresh_ahead=REPORT_REFRESH_AHEAD, refresh_interval=REPORT_REFRESH_INTERVAL,
+                 hot_window=REPORT_HOT_WINDOW, statement_timeout_ms=REPORT_STATEMENT_TIMEOUT_MS,
+                 prewarm=REPORT_PREWARM):
+        self.reports = load_reports(path)
+        self.connection = connection
+        self.serialize = serialize
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.refresh_ahead = refresh_ahead
+        self.refresh_interval = refresh_interval
+        self.hot_window = hot_window
+        self.statement_timeout_ms = statement_timeout_ms
+        self.prewarm = prewarm
+        self.runs = 0
+        self.refreshes = 0
+        self.errors = 0
+        self._requested = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ----- запросы -----
+
+    def list(self):
+        return [report.describe() for report in self.reports.values()]
+
+    def get(self, name, date_from=None, date_to=None, warehouse_id=None):
+        """Результат отчёта из кэша или свежий; ответ содержит признак cached"""
+        report = self.reports.get(name)
+        if report is None:
+            raise UnknownReportError(f"Отчёт не найден: {name}")
+        params = (date_from, date_to, warehouse_id)
+        report.query(*params)
+        self._requested[(name, params)] = time.monotonic()
+
+        result = self.cache.get(name, params)
+        if result is not None:
+            return {**result, "cached": True}
+        # Одинаковые холодные запросы ждут первого, а не выполняют отчёт параллельно
+        with self._lock(name, params):
+            result = self.cache.get(name, params)
+            if result is not None:
+                return {**result, "cached": True}
+            return {**self._run(report, params, "request"), "cached": False}
+
+    def _lock(self, name, params):
+        with self._locks_guard:
+            return self._locks.setdefault((name, params), threading.Lock())
+
+    def _run(self, report, params, trigger):
+        sql, args = report.query(*params)
+        started = time.perf_counter()
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute("SET LOCAL statement_timeout = %s", (self.statement_timeout_ms,))
+                    cur.execute(sql, args)
+                    rows = [self.serialize(row) for row in cur.fetchall()]
+            finally:
+                conn.rollback()
+        REPORT_DURATION.observe(time.perf_counter() - started, report.name)
+        REPORT_RUNS.inc(report.name, trigger)
+        self.runs += 1
+
+        result = {
+            "report": report.name,
+            "title": report.title,
+            "parameters": {
+                name: value.isoformat() if hasattr(value, "isoformat") else value
+                for name, value in zip(PARAMETERS, params)
+            },
+            "generated_at": datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
+            "data": rows,
+        }
+        self.cache.set(report.name, params, result)
+        return result
+
+    # ----- фоновое обновление -----
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="report-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        if self.prewarm:
+            for name in self.reports:
+                if self._stop.is_set():
+                    return
+                self._refresh(name, (None, None, None), "prewarm")
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def refresh(self):
+        """Пересчитать популярные записи, срок которых скоро истечёт"""
+        now = time.monotonic()
+        for name, params in self.cache.expiring(self.refresh_ahead):
+            requested = self._requested.get((name, params))
+            if requested is None or now - requested > self.hot_window:
+                continue
+            if self._stop.is_set():
+                return
+            self._refresh(name, params, "refresh")
+
+        for key, requested in list(self._requested.items()):
+            if now - requested > self.hot_window:
+                self._requested.pop(key, None)
+                with self._locks_guard:
+                    self._locks.pop(key, None)
+
+    def _refresh(self, name, params, trigger):
+        lock = self._lock(name, params)
+        # Отчёт уже выполняется по запросу - его результат и попадёт в кэш
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            self._run(self.reports[name], params, trigger)
+            self.refreshes += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Не удалось обновить отчёт {name} {params}: {e}")
+        finally:
+            lock.release()
+
+    def stats(self):
+        return {
+            "reports": len(self.reports),
+            "runs": self.runs,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.errors,
+            "hot_keys": len(self._requested),
+            "refresh_ahead_seconds": self.refresh_ahead,
+            "hot_window_seconds": self.hot_window,
+            "cache": self.cache.stats(),
+        }
@@ -0,0 +1,44 @@
+"""
+JSON-ответы через orjson для горячих эндпоинтов.
+
+Значение, возвращённое обработчиком, FastAPI прогоняет через jsonable_encoder,
+который рекурсивно обходит каждый объект; на страницах из сотен строк это
+основная работа процессора. Готовый FastJSONResponse jsonable_encoder минует:
+словари из строк Core сразу сериализуются в байты. Формат тот же, что у
+jsonable_encoder: даты и время в ISO 8601, Decimal - числом.
+Без установленного orjson используется json из стандартной библиотеки.
+"""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if orjson is None and isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    raise TypeError(f"Не сериализуется: {type(value)}")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def rows_as_dicts(rows):
+    """Строки Core (Row) в словари; имена колонок у всех строк одни"""
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
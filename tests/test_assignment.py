@@ -0,0 +1,156 @@
+from datetime import date
+
+from assignment import (NO_DRIVER, NO_ROUTE, NO_VEHICLE, DriverPool, VehicleIndex, assign, plan, release_shipments,
+                        settle)
+
+ROUTES = [(1, "Москва", "Тверь", 180), (2, "Москва", "Тверь", 170), (3, "Москва", "Казань", 820)]
+
+
+def order(order_id, priority="Обычный", day=1, weight=100, volume=1, city="Тверь"):
+    return (order_id, priority, date(2024, 1, day), weight, volume, 500, "Москва", city)
+
+
+def test_vehicle_index_takes_smallest_that_fits():
+    index = VehicleIndex([(1, 5000, 30), (2, 1500, 10), (3, 1500, 4), (4, 800, 20)])
+    assert index.take(1000, 8) == 2
+    assert index.take(1000, 8) == 1
+    assert index.take(1000, 8) is None
+    assert len(index) == 2
+
+
+def test_vehicle_index_checks_volume_after_weight():
+    index = VehicleIndex([(1, 800, 20), (2, 1000, 2)])
+    assert index.take(500, 10) == 1
+    assert index.take(500, 10) is None
+
+
+def test_driver_pool_prefers_rating_then_experience():
+    pool = DriverPool([(1, 4.5, 10), (2, 4.9, 1), (3, 4.5, 12), (4, None, None)])
+    assert [pool.take() for _ in range(4)] == [2, 3, 1, 4]
+    assert pool.take() is None
+    assert not pool
+
+
+def test_plan_gives_urgent_orders_best_driver_and_shortest_route():
+    orders = [order(10), order(11, priority="Срочный", day=5)]
+    assigned, rejected = plan(orders, [(1, 4.0, 3), (2, 4.8, 7)], [(1, 1000, 10), (2, 2000, 10)], ROUTES)
+    assert rejected == []
+    assert [(a["order_id"], a["driver_id"], a["vehicle_id"], a["route_id"]) for a in assigned] == [
+        (11, 2, 1, 2),
+        (10, 1, 2, 2),
+    ]
+
+
+def test_plan_rejects_with_reason():
+    orders = [order(1, city="Омск"), order(2, weight=9000), order(3), order(4)]
+    assigned, rejected = plan(orders, [(1, 5, 1)], [(1, 1000, 10), (2, 1000, 10)], ROUTES)
+    assert [a["order_id"] for a in assigned] == [3]
+    assert rejected == [
+        {"order_id": 2, "reason": NO_VEHICLE},
+        {"order_id": 1, "reason": NO_ROUTE},
+        {"order_id": 4, "reason": NO_DRIVER},
+    ]
+
+
+def test_plan_uses_default_route():
+    assigned, _ = plan([order(1, city="Омск")], [(1, 5, 1)], [(1, 1000, 10)], ROUTES, default_route_id=99)
+    assert assigned[0]["route_id"] == 99
+
+
+def test_settle_returns_resources_of_lost_orders():
+    planned = [
+        {"order_id": 1, "driver_id": 1, "vehicle_id": 1},
+        {"order_id": 2, "driver_id": 2, "vehicle_id": 2},
+        {"order_id": 3, "driver_id": 3, "vehicle_id": 3},
+    ]
+    won, lost, drivers, vehicles = settle(planned, {1, 2}, {1, 3})
+    assert [a["order_id"] for a in won] == [1]
+    assert lost == [2, 3]
+    assert drivers == [2]
+    assert vehicles == [3]
+
+
+class Cursor:
+    """Курсор над словарями свободных водителей и ТС; taken - занятые другим диспетчером"""
+
+    def __init__(self, orders, drivers, vehicles, taken=()):
+        self.orders = orders
+        self.free = {"drivers": dict(drivers), "vehicles": dict(vehicles)}
+        self.taken = set(taken)
+        self.rows = []
+
+    def execute(self, query, params=None):
+        table = "drivers" if "drivers" in query else "vehicles"
+        if "FROM orders" in query:
+            self.rows = self.orders
+        elif "delivery_routes" in query:
+            self.rows = ROUTES
+        elif query.lstrip().startswith("WITH free"):
+            ids = [i for i in params[0] if i in self.free[table] and (table, i) not in self.taken]
+            self.rows = [(self.free[table].pop(i)[0],) for i in ids]
+        elif "is_available = true WHERE" in query:
+            self.released = getattr(self, "released", []) + [(table, sorted(params[0]))]
+        else:
+            self.rows = list(self.free[table].values())
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_assign_replans_orders_that_lost_their_claim():
+    cur = Cursor([order(1, priority="Срочный"), order(2)],
+                 {1: (1, 4.9, 5), 2: (2, 4.0, 5), 3: (3, 3.0, 5)},
+                 {1: (1, 1000, 10), 2: (2, 2000, 10), 3: (3, 3000, 10)},
+                 taken={("vehicles", 1)})
+    assigned, rejected, _ = assign(cur)
+    assert rejected == []
+    # Заказ 1 проиграл ТС 1 и получил следующее; его водитель 1 не освобождался
+    assert sorted((a["order_id"], a["driver_id"], a["vehicle_id"]) for a in assigned) == [(1, 1, 3), (2, 2, 2)]
+    assert not hasattr(cur, "released")
+
+
+def test_assign_dry_run_claims_nothing():
+    cur = Cursor([order(1)], {1: (1, 4.9, 5)}, {1: (1, 1000, 10)})
+    assigned, _, _ = assign(cur, dry_run=True)
+    assert [a["vehicle_id"] for a in assigned] == [1]
+    assert cur.free["vehicles"] == {1: (1, 1000, 10)}
+
+
+class Fleet(Cursor):
+    """Cursor с отправками: shipment_id -> [driver_id, vehicle_id, status]"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rows_by_id = {table: dict(rows) for table, rows in self.free.items()}
+        self.shipments = {}
+
+    def execute(self, query, params=None):
+        if "SET is_available = true" in query and "FROM shipments" in query:
+            table, index = ("drivers", 0) if "drivers" in query else ("vehicles", 1)
+            shipment_ids, final, _ = params
+            done = {self.shipments[i][index] for i in shipment_ids if self.shipments[i][2] in final}
+            busy = {s[index] for s in self.shipments.values() if s[2] not in final}
+            for resource_id in done - busy:
+                self.free[table][resource_id] = self.rows_by_id[table][resource_id]
+        else:
+            super().execute(query, params)
+
+
+def test_delivered_shipment_frees_driver_and_vehicle():
+    cur = Fleet([order(1), order(2)], {1: (1, 4.9, 5), 2: (2, 4.0, 5)},
+                {1: (1, 1000, 10), 2: (2, 2000, 10)})
+    assigned, _, _ = assign(cur)
+    assert cur.free == {"drivers": {}, "vehicles": {}}
+    for shipment_id, item in enumerate(assigned, 1):
+        cur.shipments[shipment_id] = [item["driver_id"], item["vehicle_id"], "Ожидает"]
+    # Второй рейс того же водителя ещё не завершён
+    cur.shipments[3] = [cur.shipments[1][0], 2, "В пути"]
+
+    cur.shipments[1][2] = "Доставлено"
+    release_shipments(cur, [1])
+    assert list(cur.free["vehicles"]) == [cur.shipments[1][1]]
+    assert cur.free["drivers"] == {}
+
+    cur.shipments[3][2] = "Доставлено"
+    release_shipments(cur, [3])
+    assert list(cur.free["drivers"]) == [cur.shipments[1][0]]
@@ -0,0 +1,44 @@
+import pytest
+
+from fieldsets import ORDERS, SHIPMENTS, InvalidFieldsError
+
+
+def select_columns(sql):
+    return sql.split("\n")[0].removeprefix("SELECT ").split(", ")
+
+
+def test_required_columns_are_selected_once():
+    sql = ORDERS.select(ORDERS.parse("status"), required=("order_id",))
+    assert select_columns(sql) == ["o.status", "o.order_id"]
+
+
+def test_sort_columns_are_added_after_requested_fields():
+    sql = ORDERS.select(ORDERS.parse("order_id,status"), required=("order_date", "order_id"))
+    assert select_columns(sql) == ["o.order_id", "o.status", "o.order_date"]
+
+
+def test_only_joins_of_requested_fields():
+    sql = SHIPMENTS.select(SHIPMENTS.parse("status,driver_name"))
+    assert "LEFT JOIN drivers d" in sql
+    assert "LEFT JOIN employees e" in sql
+    assert "vehicles" not in sql
+    assert "delivery_routes" not in sql
+    assert "orders" not in sql
+    assert select_columns(sql) == ["s.status", "e.full_name as driver_name", "s.shipment_id"]
+
+
+def test_default_fields_keep_all_joins():
+    sql = SHIPMENTS.select(SHIPMENTS.parse(None))
+    for alias in ("o", "v", "d", "e", "dr"):
+        assert f" {alias} ON " in sql
+
+
+def test_parse_rejects_unknown_and_empty_fields():
+    with pytest.raises(InvalidFieldsError):
+        ORDERS.parse("status,password")
+    with pytest.raises(InvalidFieldsError):
+        ORDERS.parse(" , ")
+
+
+def test_parse_drops_duplicates():
+    assert ORDERS.parse("status, status,cost") == ("status", "cost")